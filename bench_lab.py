@@ -0,0 +1,308 @@
+"""
+虚拟实验室性能基准测试
+在不启动 Streamlit 的情况下，对 VirtualFaceLab.run_experiment 的各个实验
+按数据规模和分辨率分别测量计算耗时、绘图耗时和峰值内存，
+结果写入 JSON 文件，并可与保存的基准结果比较以发现性能回退。
+
+用法：
+    python bench_lab.py                              # 运行默认网格，写入 bench_results.json
+    python bench_lab.py --save-baseline              # 同时保存为基准 bench_baseline.json
+    python bench_lab.py --baseline bench_baseline.json --tolerance 0.25
+    python bench_lab.py --dtypes float32,float64     # 比较两种计算精度的速度和内存
+    python bench_lab.py --sweep 5                    # 5 折交叉验证的精度-延迟曲线（选择特征脸数量）
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from lab_core import VirtualFaceLab, benchmark_gallery_index, benchmark_solvers
+
+# ============================================================================
+# 基准测试配置
+# ============================================================================
+DEFAULT_SIZES = ['40x10', '200x10']
+DEFAULT_RESOLUTIONS = ['10x8', '56x46', '112x92']
+DEFAULT_EXPERIMENTS = list(range(1, 11))
+
+# 低于该耗时（毫秒）的差异视为噪声，不判定为回退
+NOISE_FLOOR_MS = 5.0
+
+
+def parse_pair(text):
+    """把 '40x10' 解析为 (40, 10)"""
+    first, second = text.lower().split('x')
+    return int(first), int(second)
+
+
+def median_ms(samples):
+    return float(np.median(samples)) * 1000
+
+
+# ============================================================================
+# 测量
+# ============================================================================
+def bench_config(n_people, n_variants, shape, experiments, repeat, dtype=None):
+    """对一种 (数据规模, 分辨率, 计算精度) 组合运行所有实验，返回测量结果列表"""
+    lab = VirtualFaceLab(dtype=dtype)
+    config = f'{n_people}x{n_variants}@{shape[0]}x{shape[1]}'
+    if dtype is not None:
+        config += f':{lab.dtype.name}'
+
+    start = time.perf_counter()
+    lab.setup_lab(shape=shape, n_people=n_people, n_variants=n_variants)
+    generate_s = time.perf_counter() - start
+    start = time.perf_counter()
+    model = lab.get_eigen_model()
+    fit_s = time.perf_counter() - start
+
+    rows = [{
+        'config': config,
+        'experiment': 'setup',
+        'generate_ms': generate_s * 1000,
+        'fit_ms': fit_s * 1000,
+        'dtype': lab.dtype.name,
+        'dataset_mb': lab.simulation_data['faces']['data'].nbytes / 1e6,
+        'model_mb': (model.components.nbytes + model.mean.nbytes) / 1e6
+    }]
+
+    for experiment_id in experiments:
+        compute_samples, render_samples = [], []
+        for _ in range(repeat):
+            # 每次都清空缓存（包括流水线中的中间结果），测量的是未命中缓存时的真实开销
+            lab.clear_cache()
+            start = time.perf_counter()
+            result = lab.compute_experiment(experiment_id)
+            compute_samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            lab.render_visualization(('bench', experiment_id), result['viz_spec'])
+            render_samples.append(time.perf_counter() - start)
+
+        # 峰值内存单独测量一次，避免 tracemalloc 的开销影响计时
+        lab.clear_cache()
+        tracemalloc.start()
+        lab.run_experiment(experiment_id)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rows.append({
+            'config': config,
+            'experiment': experiment_id,
+            'compute_ms': median_ms(compute_samples),
+            'render_ms': median_ms(render_samples),
+            'peak_mb': peak / 1e6
+        })
+    return rows
+
+
+def bench_cold_import(repeat):
+    """在全新的解释器中测量 import lab_core 的耗时，并检查是否提前加载了绘图库"""
+    code = ("import sys, time; start = time.perf_counter(); import lab_core; "
+            "print(time.perf_counter() - start, 'matplotlib' in sys.modules, 'streamlit' in sys.modules)")
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+        samples.append(float(output[0]))
+    return [{
+        'config': 'import',
+        'experiment': 'lab_core',
+        'import_ms': median_ms(samples),
+        'loads_matplotlib': output[1] == 'True',
+        'loads_streamlit': output[2] == 'True'
+    }]
+
+
+def bench_gallery_index():
+    """人脸库检索索引的召回率/延迟对比（见 benchmark_gallery_index）"""
+    rows = []
+    for row in benchmark_gallery_index():
+        row = dict(row, config='gallery100k', experiment=f"index:{row['method']}:{row['n_probe']}")
+        rows.append(row)
+    return rows
+
+
+def bench_solvers():
+    """特征分解求解器的耗时和精度对比（见 benchmark_solvers）"""
+    rows = []
+    for row in benchmark_solvers():
+        config = f"solver{row['n_samples']}x{row['n_features']}"
+        rows.append(dict(row, config=config, experiment=f"{row['solver']}:k={row['k']}"))
+    return rows
+
+
+def bench_accuracy_sweep(n_folds, sizes, resolutions):
+    """交叉验证的精度-延迟曲线（见 VirtualFaceLab.accuracy_sweep），每个 k 一行"""
+    rows = []
+    for size in sizes:
+        n_people, n_variants = parse_pair(size)
+        for resolution in resolutions:
+            shape = parse_pair(resolution)
+            lab = VirtualFaceLab()
+            lab.setup_lab(shape=shape, n_people=n_people, n_variants=n_variants)
+            start = time.perf_counter()
+            sweep = lab.accuracy_sweep(n_folds=n_folds)
+            sweep_s = time.perf_counter() - start
+            config = f'sweep{n_people}x{n_variants}@{shape[0]}x{shape[1]}'
+            rows.append({'config': config, 'experiment': 'total', 'sweep_ms': sweep_s * 1000,
+                         'n_folds': sweep['n_folds'], 'fit_ms': sweep['fit_ms'], 'solver': sweep['solver'],
+                         'recommended_k': sweep['recommended_k'], 'best_accuracy': sweep['best_accuracy']})
+            for k, accuracy, spread, latency in zip(sweep['k'], sweep['accuracy'], sweep['accuracy_std'],
+                                                    sweep['latency_ms']):
+                rows.append({'config': config, 'experiment': f'k={k}', 'k': int(k),
+                             'accuracy': float(accuracy), 'accuracy_std': float(spread),
+                             'query_latency_ms': float(latency)})
+    return rows
+
+
+# ============================================================================
+# 与基准比较
+# ============================================================================
+def compare_with_baseline(results, baseline, tolerance):
+    """返回超过基准 (1 + tolerance) 倍的指标列表"""
+    reference = {(row['config'], str(row['experiment'])): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        base = reference.get((row['config'], str(row['experiment'])))
+        if base is None:
+            continue
+        for metric, value in row.items():
+            if not metric.endswith('_ms') or metric not in base:
+                continue
+            old = base[metric]
+            if value > old * (1 + tolerance) and value - old > NOISE_FLOOR_MS:
+                regressions.append({
+                    'config': row['config'],
+                    'experiment': row['experiment'],
+                    'metric': metric,
+                    'baseline': old,
+                    'current': value,
+                    'ratio': value / old if old else float('inf')
+                })
+    return regressions
+
+
+def print_sweep(rows):
+    """每条精度曲线只打印推荐的 k 和若干代表性的 k"""
+    for total in [row for row in rows if 'sweep_ms' in row]:
+        curve = {row['k']: row for row in rows if row['config'] == total['config'] and 'k' in row}
+        shown = sorted({k for k in (1, 2, 5, 10, 20, 50, 100) if k in curve} | {total['recommended_k']})
+        print(f"\n{total['config']}：{total['n_folds']} 折，用时 {total['sweep_ms']:.0f} ms，"
+              f"推荐 k = {total['recommended_k']}（最高准确率 {total['best_accuracy']:.1f}%）")
+        print(f"{'k':>6}{'准确率 %':>10}{'标准差':>10}{'延迟 ms/张':>14}")
+        for k in shown:
+            row = curve[k]
+            print(f"{k:>6}{row['accuracy']:>10.2f}{row['accuracy_std']:>10.2f}{row['query_latency_ms']:>14.4f}")
+
+
+def print_table(rows):
+    for row in rows:
+        if 'import_ms' in row:
+            print(f"冷启动 import {row['experiment']}: {row['import_ms']:.1f} ms "
+                  f"(matplotlib: {row['loads_matplotlib']}, streamlit: {row['loads_streamlit']})")
+    print(f"{'配置':<22}{'实验':<18}{'计算 ms':>10}{'绘图 ms':>10}{'峰值 MB':>10}")
+    for row in rows:
+        if 'compute_ms' not in row:
+            continue
+        print(f"{row['config']:<22}{str(row['experiment']):<18}"
+              f"{row['compute_ms']:>10.2f}{row['render_ms']:>10.1f}{row['peak_mb']:>10.2f}")
+    setup_rows = [row for row in rows if row.get('experiment') == 'setup']
+    if setup_rows:
+        print(f"\n{'配置':<30}{'生成 ms':>10}{'拟合 ms':>10}{'数据 MB':>10}{'模型 MB':>10}")
+        for row in setup_rows:
+            print(f"{row['config']:<30}{row['generate_ms']:>10.1f}{row['fit_ms']:>10.1f}"
+                  f"{row['dataset_mb']:>10.2f}{row['model_mb']:>10.2f}")
+    solver_rows = [row for row in rows if 'fit_ms' in row and 'solver' in row and 'sweep_ms' not in row]
+    if solver_rows:
+        print(f"\n{'求解器':<14}{'N×D':<14}{'k':>6}{'拟合 ms':>10}{'特征值误差':>12}{'方差比':>10}")
+        for row in solver_rows:
+            print(f"{row['solver']:<14}{row['n_samples']}×{row['n_features']:<9}{str(row['k']):>6}"
+                  f"{row['fit_ms']:>10.1f}{row.get('eigenvalue_error', 0.0):>12.4f}"
+                  f"{row.get('variance_ratio', 1.0):>10.4f}")
+
+
+# ============================================================================
+# 命令行入口
+# ============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='虚拟实验室性能基准测试')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help='数据规模列表，人数x每人张数，逗号分隔')
+    parser.add_argument('--resolutions', default=','.join(DEFAULT_RESOLUTIONS),
+                        help='分辨率列表，高x宽，逗号分隔')
+    parser.add_argument('--experiments', default=','.join(map(str, DEFAULT_EXPERIMENTS)),
+                        help='实验编号列表，逗号分隔')
+    parser.add_argument('--dtypes', default=None,
+                        help='计算精度列表（如 float32,float64），逗号分隔；默认使用 COMPUTE_DTYPE')
+    parser.add_argument('--repeat', type=int, default=3, help='每个实验重复次数（取中位数）')
+    parser.add_argument('--index', action='store_true', help='同时测试人脸库检索索引')
+    parser.add_argument('--solvers', action='store_true', help='同时测试特征分解求解器')
+    parser.add_argument('--sweep', type=int, default=0, metavar='FOLDS',
+                        help='同时做 FOLDS 折交叉验证的精度-延迟扫描（0 表示不做）')
+    parser.add_argument('--output', default='bench_results.json', help='结果文件')
+    parser.add_argument('--baseline', default=None, help='用于比较的基准结果文件')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许的相对变慢比例')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为 bench_baseline.json')
+    args = parser.parse_args(argv)
+
+    experiments = [int(x) for x in args.experiments.split(',')]
+    dtypes = args.dtypes.split(',') if args.dtypes else [None]
+    results = bench_cold_import(args.repeat)
+    for size in args.sizes.split(','):
+        n_people, n_variants = parse_pair(size)
+        for resolution in args.resolutions.split(','):
+            for dtype in dtypes:
+                results.extend(bench_config(n_people, n_variants, parse_pair(resolution),
+                                            experiments, args.repeat, dtype))
+    if args.index:
+        results.extend(bench_gallery_index())
+    if args.solvers:
+        results.extend(bench_solvers())
+    if args.sweep:
+        results.extend(bench_accuracy_sweep(args.sweep, args.sizes.split(','), args.resolutions.split(',')))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open('bench_baseline.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_table(results)
+    print_sweep(results)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠️ 发现 {len(regressions)} 项性能回退：")
+            for item in regressions:
+                print(f"  {item['config']} 实验{item['experiment']} {item['metric']}: "
+                      f"{item['baseline']:.2f} → {item['current']:.2f} ms (×{item['ratio']:.2f})")
+            return 1
+        print("\n✅ 未发现性能回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,3245 @@
+"""
+线性代数人脸识别虚拟仿真实验室 - 计算核心
+特征脸模型、人脸数据、检索索引、缓存和各实验的计算与绘图，
+不依赖 Streamlit，可在脚本、后台进程和测试中直接导入。
+matplotlib 和 scikit-learn 只在第一次用到时才加载。
+"""
+
+import numpy as np
+from io import BytesIO
+import time
+import os
+import threading
+import copy
+import itertools
+import json
+import re
+import hashlib
+import mmap
+import tracemalloc
+import multiprocessing
+from concurrent.futures import (Future, ProcessPoolExecutor, ThreadPoolExecutor,
+                                TimeoutError as FuturesTimeoutError, as_completed)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+
+
+# ============================================================================
+# 可选依赖的惰性加载
+# ============================================================================
+_pyplot_module = None
+_kdtree_class = None
+_eigsh_function = None
+
+
+def _pyplot():
+    """惰性加载 matplotlib.pyplot（使用无界面的 Agg 后端）"""
+    global _pyplot_module
+    if _pyplot_module is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        _pyplot_module = plt
+    return _pyplot_module
+
+
+def _kdtree():
+    """惰性加载 scikit-learn 的 KDTree，未安装时返回 None"""
+    global _kdtree_class
+    if _kdtree_class is None:
+        try:
+            from sklearn.neighbors import KDTree
+        except ImportError:  # scikit-learn 是可选依赖，缺失时不提供 KD 树索引
+            return None
+        _kdtree_class = KDTree
+    return _kdtree_class
+
+
+def _eigsh():
+    """惰性加载 SciPy 的 Lanczos 求解器 eigsh，未安装时返回 None"""
+    global _eigsh_function
+    if _eigsh_function is None:
+        try:
+            from scipy.sparse.linalg import eigsh
+        except ImportError:  # SciPy 是可选依赖，缺失时 auto 改用随机化 SVD
+            return None
+        _eigsh_function = eigsh
+    return _eigsh_function
+
+
+# ============================================================================
+# 特征脸计算引擎
+# ============================================================================
+# 人脸数据、特征脸和特征向量的存储与计算精度。float32 占用一半内存、BLAS 吞吐翻倍；
+# 跨样本的求和（均值、协方差/Gram 矩阵、误差曲线）和特征分解本身仍用 float64 累加。
+COMPUTE_DTYPE = np.dtype(os.environ.get('FACE_LAB_DTYPE', 'float32'))
+
+
+def _report(progress, fraction, message):
+    """调用进度回调 progress(fraction, message)，fraction 取值 0-1"""
+    if progress is not None:
+        progress(min(max(fraction, 0.0), 1.0), message)
+
+
+def _sub_progress(progress, start, end):
+    """把子任务的 0-1 进度映射到总进度的 [start, end] 区间"""
+    if progress is None:
+        return None
+    return lambda fraction, message: progress(start + (end - start) * fraction, message)
+
+
+# 特征分解方法：完整 eigh、Lanczos 迭代（只求前 k 个）、随机化 SVD
+SOLVERS = ('eigh', 'lanczos', 'randomized')
+
+
+def choose_solver(n_samples, n_features, n_components=None):
+    """根据样本数 N、维度 D 和需要的主成分数 k 选择特征分解方法
+
+    - 需要全部特征值（k 为 None）、问题较小（min(N, D) <= 500）或 k 超过 min(N, D) 的 1/4：eigh
+    - min(N, D) > 2000：randomized，直接在数据上做随机化 SVD，不构造 m×m 矩阵
+    - 其余：lanczos（未安装 SciPy 时改用 randomized）
+    """
+    size = min(n_samples, n_features)
+    if n_components is None or size <= 500 or n_components > size // 4:
+        return 'eigh'
+    if size > 2000 or _eigsh() is None:
+        return 'randomized'
+    return 'lanczos'
+
+
+def available_solvers():
+    """当前环境可用的求解器（Lanczos 需要 SciPy）"""
+    return tuple(solver for solver in SOLVERS if solver != 'lanczos' or _eigsh() is not None)
+
+
+def _top_eigenpairs(matrix, k, solver, seed=42):
+    """对称半正定矩阵的前 k 个特征值（降序）和特征向量"""
+    if solver == 'lanczos' and k < matrix.shape[0] - 1:
+        eigsh = _eigsh()
+        if eigsh is None:
+            raise ImportError("Lanczos 求解器需要安装 SciPy")
+        # 固定初始向量，结果可重复
+        v0 = np.random.default_rng(seed).standard_normal(matrix.shape[0])
+        eigenvalues, eigenvectors = eigsh(matrix, k=k, which='LA', v0=v0)
+    else:
+        eigenvalues, eigenvectors = np.linalg.eigh(matrix)
+    order = np.argsort(eigenvalues)[::-1][:k]
+    return eigenvalues[order], eigenvectors[:, order]
+
+
+def mean_face(data, chunk_size=1024, dtype=None):
+    """分块计算平均脸：float64 累加，按 dtype（默认 COMPUTE_DTYPE）返回"""
+    mean = np.zeros(data.shape[1])
+    for start in range(0, len(data), chunk_size):
+        mean += np.asarray(data[start:start + chunk_size]).sum(axis=0, dtype=np.float64)
+    return (mean / len(data)).astype(dtype or COMPUTE_DTYPE)
+
+
+class CenteredFaces:
+    """中心化人脸矩阵 X - μ 的惰性视图
+
+    只保存原始数据（可以是内存映射数组）和平均脸，按行切片或按块迭代时才做减法，
+    不会复制整个数据集。
+    """
+
+    def __init__(self, data, mean, chunk_size=1024):
+        self.data = data
+        self.mean = mean
+        self.chunk_size = chunk_size
+        self.shape = data.shape
+        self.dtype = mean.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        return np.asarray(self.data[rows], dtype=self.dtype) - self.mean
+
+    def chunks(self):
+        """逐块产出 (起始行, 中心化后的块)"""
+        for start in range(0, len(self), self.chunk_size):
+            yield start, self[start:start + self.chunk_size]
+
+
+class FaceRows:
+    """人脸矩阵中按下标选取的若干行的惰性视图
+
+    布尔或整数数组索引会把选中的行一次性复制到内存；这里只在按块切片时读取对应的行，
+    内存映射的数据集不会被整体载入。可以直接传给 EigenfaceModel.fit / project。
+    """
+
+    ndim = 2
+
+    def __init__(self, data, indices):
+        self.data = data
+        self.indices = np.asarray(indices)
+        self.shape = (len(self.indices), data.shape[1])
+        self.dtype = data.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        return np.asarray(self.data[self.indices[rows]])
+
+
+def second_moment_matrix(centered, progress=None):
+    """中心化数据的二阶矩矩阵，返回 (矩阵, 方法)
+
+    - D <= N：协方差矩阵 C = X^T X / (N-1)，大小 D×D，方法为 'covariance'
+    - D > N：Gram 矩阵 G = X X^T / (N-1)，大小 N×N，与 C 有相同的非零特征值，方法为 'gram'
+    逐块乘积在数据精度下完成，累加到 float64 矩阵中。
+    """
+    n_samples, n_features = centered.shape
+    if n_features <= n_samples:
+        matrix = np.zeros((n_features, n_features))
+        for start, chunk in centered.chunks():
+            _report(progress, 0.1 + 0.5 * start / n_samples, "累加协方差矩阵...")
+            matrix += chunk.T @ chunk
+        method = 'covariance'
+    else:
+        matrix = np.zeros((n_samples, n_samples))
+        for i, chunk_i in centered.chunks():
+            _report(progress, 0.1 + 0.5 * i / n_samples, "计算 Gram 矩阵...")
+            rows = slice(i, i + len(chunk_i))
+            # 只读取并中心化上三角需要的块（j >= i），对角块直接复用 chunk_i
+            for j in range(i, n_samples, centered.chunk_size):
+                chunk_j = chunk_i if j == i else centered[j:j + centered.chunk_size]
+                cols = slice(j, j + len(chunk_j))
+                matrix[rows, cols] = chunk_i @ chunk_j.T
+                matrix[cols, rows] = matrix[rows, cols].T
+        method = 'gram'
+    matrix /= n_samples - 1
+    return matrix, method
+
+
+class EigenfaceModel:
+    """特征脸（PCA）模型
+
+    根据样本数 N 和维度 D 自动选择分解方式：
+    - D <= N：直接分解 D×D 协方差矩阵
+    - D > N：分解 N×N 的 Gram 矩阵，再映射回像素空间（Turk & Pentland 技巧）
+    只需要前 k 个特征脸时可以改用 Lanczos 迭代或随机化 SVD（见 choose_solver）。
+    均值、特征脸和投影按 dtype 存储和计算（默认 COMPUTE_DTYPE），
+    逐块的矩阵乘积在 dtype 下完成，块之间的累加和特征分解用 float64。
+    """
+
+    def __init__(self, dtype=None):
+        self.dtype = np.dtype(dtype or COMPUTE_DTYPE)
+        self.mean = None
+        self.components = None   # (D, r)，每一列是一张单位特征脸
+        self.eigenvalues = None  # (r,)，降序排列
+        self.total_variance = None  # 全部特征值之和（截断求解时 eigenvalues 只是其中一部分）
+        self.method = None
+        self.solver = None
+        self.n_samples = 0
+
+    def fit(self, data, chunk_size=1024, progress=None, n_components=None, solver='auto',
+            n_oversamples=20, n_iter=7, seed=42):
+        """在人脸矩阵 data (N, D) 上拟合特征脸
+
+        data 可以是内存映射数组，所有计算都按 chunk_size 行分块进行，
+        不会把整个数据集复制到内存中。progress(fraction, message) 用于报告进度。
+        n_components 为 None 时保留全部主成分；solver 为 'auto' 或 SOLVERS 之一，
+        截断求解器（lanczos、randomized）只计算前 n_components 个。
+        """
+        if data.shape[0] < 2:
+            raise ValueError("至少需要2张人脸才能计算特征脸")
+        _report(progress, 0.0, "计算平均脸...")
+        centered = CenteredFaces(data, mean_face(data, chunk_size, self.dtype), chunk_size)
+        return self.fit_centered(centered, progress=progress, n_components=n_components, solver=solver,
+                                 n_oversamples=n_oversamples, n_iter=n_iter, seed=seed)
+
+    def fit_centered(self, centered, moment=None, progress=None, n_components=None, solver='auto',
+                     n_oversamples=20, n_iter=7, seed=42):
+        """在已中心化的人脸（CenteredFaces）上拟合特征脸
+
+        moment 为 second_moment_matrix(centered) 的结果，已经算好时传入可以跳过累加
+        （见 LabPipeline）；randomized 求解器不需要它。
+        """
+        n_samples, n_features = centered.shape
+        if n_samples < 2:
+            raise ValueError("至少需要2张人脸才能计算特征脸")
+        if solver == 'auto':
+            solver = choose_solver(n_samples, n_features, n_components)
+        if solver not in SOLVERS:
+            raise ValueError(f"未知求解器: {solver}，可选 {SOLVERS}")
+        if solver != 'eigh' and n_components is None:
+            raise ValueError(f"{solver} 求解器需要指定 n_components")
+        # 中心化后秩最多为 N-1
+        k = min(n_features, n_samples - 1) if n_components is None else \
+            max(1, min(n_components, n_features, n_samples - 1))
+        self.mean = centered.mean
+
+        if solver == 'randomized':
+            eigenvalues, components, total = self._randomized_svd(centered.chunks, n_samples, n_features, k,
+                                                                   n_oversamples, n_iter, seed, progress)
+            self.method = 'randomized'
+        else:
+            matrix, method = moment if moment is not None else second_moment_matrix(centered, progress)
+            total = float(np.trace(matrix))
+            _report(progress, 0.6, "特征值分解...")
+            eigenvalues, eigenvectors = _top_eigenpairs(matrix, k, solver, seed)
+            if method == 'covariance':
+                eigenvalues = np.clip(eigenvalues, 0, None)
+                components = eigenvectors
+            else:
+                # 只保留非零特征值（秩最多为 N-1）；Gram 矩阵的舍入误差与存储精度相当，
+                # 低于该量级的特征值是噪声，映射回像素空间时会被 1/sqrt(λ) 放大
+                keep = eigenvalues > eigenvalues[0] * max(1e-10, 100 * np.finfo(self.dtype).eps)
+                eigenvalues = eigenvalues[keep]
+
+                # v_i = X^T u_i / sqrt((N-1) λ_i)，只映射需要的 k 个
+                eigenvectors = eigenvectors[:, keep].astype(self.dtype)
+                components = np.zeros((n_features, len(eigenvalues)))
+                for start, chunk in centered.chunks():
+                    _report(progress, 0.8 + 0.2 * start / n_samples, "映射回像素空间...")
+                    components += chunk.T @ eigenvectors[start:start + len(chunk)]
+                components /= np.sqrt((n_samples - 1) * eigenvalues)
+            self.method = method
+
+        self.components = components.astype(self.dtype)
+        self.eigenvalues = eigenvalues
+        self.total_variance = total
+        self.solver = solver
+        self.n_samples = n_samples
+        return self
+
+    def _randomized_svd(self, centered_chunks, n_samples, n_features, k, n_oversamples, n_iter, seed,
+                        progress=None):
+        """随机化值域查找 SVD（Halko et al., 2011），按块读取数据
+
+        每一轮幂迭代读两遍数据，耗时约为 O(N·D·(k+p))，不需要构造 D×D 或 N×N 矩阵。
+        返回 (特征值, 特征脸 (D, k), 总方差)。
+        """
+        rng = np.random.default_rng(seed)
+        width = min(k + n_oversamples, n_samples, n_features)
+        # 在像素空间中迭代：Q 的列张成 X^T X 的主子空间
+        basis = rng.standard_normal((n_features, width))
+        total = 0.0
+        for step in range(n_iter + 1):
+            _report(progress, 0.1 + 0.8 * step / (n_iter + 1), "随机化 SVD 幂迭代...")
+            basis, _ = np.linalg.qr(basis)
+            narrow = basis.astype(self.dtype)
+            product = np.zeros((n_features, width))
+            for _, chunk in centered_chunks():
+                product += chunk.T @ (chunk @ narrow)
+                if step == 0:
+                    total += np.einsum('ij,ij->', chunk, chunk, dtype=np.float64)
+            if step < n_iter:
+                basis = product
+        # Rayleigh-Ritz：在子空间中求 C 的特征对，B = Q^T X^T X Q
+        small = basis.T @ product
+        eigenvalues, vectors = np.linalg.eigh((small + small.T) / 2)
+        order = np.argsort(eigenvalues)[::-1][:k]
+        eigenvalues = np.clip(eigenvalues[order], 0, None) / (n_samples - 1)
+        return eigenvalues, basis @ vectors[:, order], total / (n_samples - 1)
+
+    @property
+    def n_components(self):
+        return self.components.shape[1]
+
+    # 批量投影/重建时每块输入约占的字节数，块内的中心化缓冲区可留在 L2/L3 缓存中
+    BATCH_BYTES = 4 * 1024 * 1024
+
+    def _batch_rows(self, n_features, chunk_size):
+        if chunk_size is None:
+            chunk_size = self.BATCH_BYTES // (n_features * self.dtype.itemsize)
+        return max(1, chunk_size)
+
+    @staticmethod
+    def _run_batches(fill, n_rows, chunk_size, workers):
+        """对 [start, start + chunk_size) 各块调用 fill(start, stop)
+
+        workers > 1 时交给线程池：各块写入输出数组中互不重叠的区域，
+        NumPy 的矩阵乘法会释放 GIL，因此线程可以真正并行。
+        """
+        bounds = [(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
+        if workers and workers > 1 and len(bounds) > 1:
+            with ThreadPoolExecutor(min(workers, len(bounds))) as executor:
+                for future in [executor.submit(fill, *bound) for bound in bounds]:
+                    future.result()
+        else:
+            for bound in bounds:
+                fill(*bound)
+
+    def project(self, faces, n_components=None, chunk_size=None, out=None, workers=None):
+        """投影到前 n_components 个特征脸：y = V_k^T (x - μ)
+
+        faces 为一张人脸 (D,) 或一批人脸 (n, D)，可以是内存映射数组。
+        批量输入按块处理：每块复制到预分配的中心化缓冲区，再做一次矩阵乘法，
+        结果直接写入 out（形状 (n, k)，为 None 时新建）。workers > 1 时用线程池并行处理各块。
+        """
+        k = self.n_components if n_components is None else min(n_components, self.n_components)
+        # ndarray、内存映射数组和 FaceRows 都按块读取，其他输入（列表等）先转成数组
+        faces = faces if hasattr(faces, 'shape') else np.asarray(faces)
+        if faces.ndim == 1:
+            return (faces.astype(self.dtype, copy=False) - self.mean) @ self.components[:, :k]
+
+        n_rows, n_features = faces.shape
+        if out is None:
+            out = np.empty((n_rows, k), dtype=self.dtype)
+        components = self.components[:, :k]
+        chunk_size = self._batch_rows(n_features, chunk_size)
+
+        def fill(start, stop):
+            centered = np.empty((stop - start, n_features), dtype=self.dtype)
+            np.subtract(faces[start:stop], self.mean, out=centered)
+            np.matmul(centered, components, out=out[start:stop])
+
+        self._run_batches(fill, n_rows, chunk_size, workers)
+        return out
+
+    def reconstruct(self, coords, n_components=None, chunk_size=None, out=None, workers=None):
+        """由投影坐标重建人脸：x̂ = μ + V_k y
+
+        coords 为 (k',) 或 (n, k')；n_components 为 None 时使用全部 k' 个坐标，
+        否则只用前 n_components 个（对应截断到 k 个特征脸的重建）。
+        批量输入按块写入预分配的 out（形状 (n, D)），workers 与 project 相同。
+        """
+        coords = np.asarray(coords)
+        k = coords.shape[-1] if n_components is None else min(n_components, coords.shape[-1])
+        components = self.components[:, :k].T
+        if coords.ndim == 1:
+            return self.mean + coords[:k].astype(self.dtype, copy=False) @ components
+
+        n_rows, n_features = len(coords), len(self.mean)
+        if out is None:
+            out = np.empty((n_rows, n_features), dtype=self.dtype)
+        chunk_size = self._batch_rows(n_features, chunk_size)
+
+        def fill(start, stop):
+            block = out[start:stop]
+            np.matmul(coords[start:stop, :k].astype(self.dtype, copy=False), components, out=block)
+            block += self.mean
+
+        self._run_batches(fill, n_rows, chunk_size, workers)
+        return out
+
+    def reconstruction_errors(self, faces, average=False, chunk_size=1024):
+        """所有 k = 0..r 的重建均方误差，只需一次投影
+
+        特征脸正交，因此 ||x - x̂_k||² = ||x - μ||² - Σ_{i≤k} y_i²，
+        对投影坐标的平方做累加和即可得到整条误差曲线，不必做 r 次重建。
+        两者相减存在抵消，平方和与累加和都用 float64 计算。
+        faces 为一维时返回 (r+1,)；二维时返回 (N, r+1)，average=True 时返回全部人脸的平均曲线 (r+1,)。
+        """
+        faces = np.asarray(faces)
+        single = faces.ndim == 1
+        faces = np.atleast_2d(faces)
+        n_features = faces.shape[1]
+
+        curves = None if average else np.empty((len(faces), self.n_components + 1))
+        total_energy, component_energy = 0.0, np.zeros(self.n_components)
+        for start in range(0, len(faces), chunk_size):
+            centered = np.asarray(faces[start:start + chunk_size], dtype=self.dtype) - self.mean
+            coords = (centered @ self.components).astype(np.float64)
+            energy = np.einsum('ij,ij->i', centered, centered, dtype=np.float64)
+            if average:
+                # 累加和是线性的：先对人脸求和，再沿 k 累加
+                total_energy += energy.sum()
+                component_energy += np.einsum('ij,ij->j', coords, coords)
+            else:
+                block = curves[start:start + len(centered)]
+                block[:, 0] = energy
+                block[:, 1:] = energy[:, None] - np.cumsum(coords ** 2, axis=1)
+
+        if average:
+            curve = np.concatenate([[total_energy], total_energy - np.cumsum(component_energy)])
+            # 舍入误差可能让尾部略小于 0
+            return np.maximum(curve, 0) / (len(faces) * n_features)
+        np.maximum(curves, 0, out=curves)
+        curves /= n_features
+        return curves[0] if single else curves
+
+    def partial_fit(self, batch, max_components=None):
+        """增量更新：把一批新人脸并入现有模型，无需重新分解全部数据
+
+        采用增量 SVD（Ross et al., 2008）：对
+        [diag(s) V^T; 批次中心化数据; 均值修正项] 做 SVD，
+        其大小为 (r + b + 1) × D，耗时只与当前秩 r 和批大小 b 有关，与总样本数无关。
+        """
+        batch = np.atleast_2d(np.asarray(batch, dtype=np.float64))
+        if self.mean is None:
+            return self.fit(batch)
+        # 小矩阵的 SVD 用 float64，结果按模型精度存储
+        old_mean = self.mean.astype(np.float64)
+
+        n_old, n_batch = self.n_samples, len(batch)
+        n_total = n_old + n_batch
+        batch_mean = batch.mean(axis=0)
+        new_mean = old_mean + (batch_mean - old_mean) * (n_batch / n_total)
+
+        # 奇异值 s_i = sqrt((N-1) λ_i)
+        singular_values = np.sqrt(self.eigenvalues * (n_old - 1))
+        mean_correction = np.sqrt(n_old * n_batch / n_total) * (old_mean - batch_mean)
+        stacked = np.vstack([
+            singular_values[:, None] * self.components.T.astype(np.float64),
+            batch - batch_mean,
+            mean_correction
+        ])
+        _, singular_values, vt = np.linalg.svd(stacked, full_matrices=False)
+        # 总方差按合并后的离差平方和更新（截断模型丢失的部分无法恢复）
+        self.total_variance = (self.total_variance * (n_old - 1) + np.sum(singular_values ** 2)
+                               - np.sum(self.eigenvalues) * (n_old - 1)) / (n_total - 1)
+
+        keep = singular_values > singular_values[0] * 1e-10
+        if max_components is not None:
+            keep[max_components:] = False
+        self.mean = new_mean.astype(self.dtype)
+        self.components = vt[keep].T.astype(self.dtype)
+        self.eigenvalues = singular_values[keep] ** 2 / (n_total - 1)
+        self.n_samples = n_total
+        self.method = 'incremental'
+        return self
+
+    def drift_from(self, reference, n_components=20):
+        """与参考模型（通常是全量重新拟合的结果）比较前 n_components 个主成分的偏差
+
+        - mean_shift：均值差的相对范数
+        - eigenvalue_error：特征值的最大相对误差
+        - subspace_angle：两个主子空间之间的最大主角（度）
+        """
+        k = min(n_components, self.n_components, reference.n_components)
+        mean_shift = np.linalg.norm(self.mean.astype(np.float64) - reference.mean) / \
+            max(np.linalg.norm(reference.mean), 1e-12)
+        eigenvalue_error = np.max(np.abs(self.eigenvalues[:k] - reference.eigenvalues[:k]) /
+                                  np.maximum(reference.eigenvalues[:k], 1e-12))
+        cosines = np.linalg.svd(self.components[:, :k].T.astype(np.float64) @ reference.components[:, :k],
+                                compute_uv=False)
+        subspace_angle = np.degrees(np.arccos(np.clip(cosines.min(), -1.0, 1.0)))
+        return {
+            'n_components': k,
+            'mean_shift': float(mean_shift),
+            'eigenvalue_error': float(eigenvalue_error),
+            'subspace_angle': float(subspace_angle)
+        }
+
+
+def _solver_accuracy(model, reference, n_components):
+    """截断求解相对完整分解的精度
+
+    - eigenvalue_error：前 k 个特征值的最大相对误差
+    - variance_ratio：前 k 个主成分捕获的方差占完整解的比例（决定重建误差）
+    - subspace_angle：子空间最大主角（度）；特征值接近简并时该值可以很大而不影响重建
+    """
+    drift = model.drift_from(reference, n_components)
+    k = drift['n_components']
+    return {
+        'n_components': k,
+        'eigenvalue_error': drift['eigenvalue_error'],
+        'variance_ratio': float(model.eigenvalues[:k].sum() / reference.eigenvalues[:k].sum()),
+        'subspace_angle': drift['subspace_angle']
+    }
+
+
+def benchmark_solvers(shapes=((200, 10304), (2000, 2576), (400, 80)), n_components=(20, 80), seed=42):
+    """比较各求解器的拟合耗时，以及截断解相对完整 eigh 的特征值误差和子空间夹角
+
+    shapes 为 (N, D) 列表，数据为低秩结构加噪声的合成人脸。
+    """
+    rows = []
+    for n_samples, n_features in shapes:
+        data = generate_synthetic_faces(n_people=max(2, n_samples // 10), n_variants=10,
+                                        shape=(n_features, 1), rng=np.random.default_rng(seed))[0][:n_samples]
+        start = time.perf_counter()
+        reference = EigenfaceModel(np.float64).fit(data, solver='eigh')
+        rows.append({'solver': 'eigh', 'n_samples': n_samples, 'n_features': n_features, 'k': None,
+                     'fit_ms': (time.perf_counter() - start) * 1000})
+        for k in n_components:
+            for solver in ('lanczos', 'randomized'):
+                if solver == 'lanczos' and _eigsh() is None:
+                    continue
+                start = time.perf_counter()
+                model = EigenfaceModel().fit(data, n_components=k, solver=solver, seed=seed)
+                fit_ms = (time.perf_counter() - start) * 1000
+                rows.append({'solver': solver, 'n_samples': n_samples, 'n_features': n_features, 'k': k,
+                             'fit_ms': fit_ms, 'auto': choose_solver(n_samples, n_features, k),
+                             **_solver_accuracy(model, reference, k)})
+    return rows
+
+
+# 低精度距离矩阵只用于初筛，额外保留的候选数，由 float64 精确距离重新排序
+RERANK_MARGIN = 8
+
+
+def knn_search(queries, gallery, k=1, chunk_size=None, gallery_sq_norms=None):
+    """批量最近邻搜索
+
+    利用 ||q - g||² = ||q||² - 2 q·g + ||g||² 把距离计算变成矩阵乘法，
+    按查询分块计算 query×gallery 距离矩阵以限制内存占用。
+    输入为 float32 时展开式存在抵消误差，先取 k + RERANK_MARGIN 个候选，
+    再用 float64 直接计算差向量的范数重新排序，返回的索引和距离与 float64 计算一致。
+    返回前 k 个最近邻的索引和欧氏距离，形状均为 (n_queries, k)，按距离升序。
+    """
+    queries = np.atleast_2d(np.asarray(queries))
+    gallery = np.atleast_2d(np.asarray(gallery))
+    n_queries, n_gallery = len(queries), len(gallery)
+    k = min(k, n_gallery)
+    dtype = np.result_type(queries, gallery)
+    rerank = dtype.kind == 'f' and dtype.itemsize < 8
+    n_candidates = min(n_gallery, k + RERANK_MARGIN) if rerank else k
+    if gallery_sq_norms is None:
+        gallery_sq_norms = np.einsum('ij,ij->i', gallery, gallery)
+    if chunk_size is None:
+        # 每块距离矩阵约 32MB；重排序时候选人脸的 float64 差向量也计入
+        row_bytes = max(dtype.itemsize * n_gallery, 8 * n_candidates * gallery.shape[1] if rerank else 0, 1)
+        chunk_size = max(1, (32 * 1024 * 1024) // row_bytes)
+
+    indices = np.empty((n_queries, k), dtype=np.intp)
+    distances = np.empty((n_queries, k), dtype=np.float64)
+    for start in range(0, n_queries, chunk_size):
+        chunk = queries[start:start + chunk_size]
+        sq_dist = chunk @ gallery.T
+        sq_dist *= -2
+        sq_dist += gallery_sq_norms
+        sq_dist += np.einsum('ij,ij->i', chunk, chunk)[:, None]
+        np.maximum(sq_dist, 0, out=sq_dist)
+
+        if n_candidates < n_gallery:
+            top = np.argpartition(sq_dist, n_candidates - 1, axis=1)[:, :n_candidates]
+        else:
+            top = np.broadcast_to(np.arange(n_gallery), sq_dist.shape)
+        if rerank:
+            diff = gallery[top].astype(np.float64)
+            diff -= chunk[:, None, :]
+            top_dist = np.einsum('ijk,ijk->ij', diff, diff)
+        else:
+            top_dist = np.take_along_axis(sq_dist, top, axis=1)
+        order = np.argsort(top_dist, axis=1)[:, :k]
+        indices[start:start + len(chunk)] = np.take_along_axis(top, order, axis=1)
+        distances[start:start + len(chunk)] = np.sqrt(np.take_along_axis(top_dist, order, axis=1))
+    return indices, distances
+
+
+# ============================================================================
+# 计算流水线
+# ============================================================================
+class LabPipeline:
+    """特征脸计算流水线：数据 → 平均脸 → 中心化 → 二阶矩矩阵 → 特征分解 → 投影、重建误差
+
+    每个节点按 (自身参数, 上游节点的键) 缓存。键只由参数决定，不必先算出上游的值：
+    - 改变 n_samples 时平均脸及其下游的键都会变化，只重新计算这些节点；
+    - 完整分解（eigh）与 n_components 无关，切换 k 时直接复用特征分解和投影；
+    - 截断求解器（lanczos、randomized）按 (求解器, k) 缓存。
+    上游节点在用到时才计算（例如 randomized 求解不需要二阶矩矩阵）。
+    train_eigen / train_projection 只在训练集行（set_data 的 train_mask）上拟合，
+    识别实验用它们评估测试集，特征基不会见过测试人脸。
+    set_data 更换数据集时清空全部节点。
+    """
+
+    # 节点 → (上游节点, 节点读取的参数)
+    NODES = {
+        'data': ((), ('n_samples',)),
+        'mean': (('data',), ()),
+        'centered': (('data', 'mean'), ()),
+        'moment': (('centered',), ()),
+        'eigen': (('centered', 'moment'), ('n_components', 'solver')),
+        'projection': (('centered', 'eigen'), ()),
+        'reconstruction_error': (('data', 'eigen'), ()),
+        'train_eigen': (('data',), ('n_components', 'solver')),
+        'train_projection': (('data', 'train_eigen'), ()),
+    }
+    # 每个节点保留的最近几组参数
+    CACHE_SIZES = {'mean': 8, 'centered': 8, 'eigen': 8, 'train_eigen': 8}
+
+    def __init__(self, data=None, dtype=None, chunk_size=1024):
+        self.dtype = np.dtype(dtype or COMPUTE_DTYPE)
+        self.chunk_size = chunk_size
+        self.version = 0
+        # 多个会话共享同一条流水线：锁只保护缓存和进行中的计算表，节点在锁外计算，
+        # 一个会话未命中缓存时不会阻塞其他会话读取已缓存的节点
+        self._lock = threading.Lock()
+        self.set_data(data)
+
+    def set_data(self, data, train_mask=None):
+        """更换人脸矩阵 (N, D) 和训练集划分（(N,) 布尔数组，True 为训练集），所有节点失效"""
+        with self._lock:
+            self.data = data
+            self.train_mask = None if train_mask is None else np.asarray(train_mask, dtype=bool)
+            self.version += 1
+            self._caches = {node: LRUCache(maxsize=self.CACHE_SIZES.get(node, 4)) for node in self.NODES}
+            # 键 → 正在计算该键的 Future，同一个键只计算一次，其他会话等待结果
+            self._pending = {}
+
+    def clear(self):
+        """清空所有节点的缓存（数据集不变），之后的读取会重新计算"""
+        with self._lock:
+            for cache in self._caches.values():
+                cache.clear()
+
+    def _own_params(self, node, params):
+        """节点自身参数的规范形式（等价的参数得到相同的键）"""
+        n_total, n_features = self.data.shape
+        n_samples = params.get('n_samples')
+        n_samples = n_total if n_samples is None else max(1, min(int(n_samples), n_total))
+        if node == 'data':
+            return (self.version, n_samples)
+        if node in ('eigen', 'train_eigen'):
+            n_components, solver = params.get('n_components'), params.get('solver', 'auto')
+            if n_components is None:
+                return ('eigh', None)
+            if solver == 'auto':
+                n_rows = n_samples if node == 'eigen' else len(self._train_rows(n_samples))
+                solver = choose_solver(n_rows, n_features, n_components)
+            return (solver, None if solver == 'eigh' else n_components)
+        return ()
+
+    def _train_rows(self, n_samples):
+        """前 n_samples 张人脸中训练集行的下标"""
+        if self.train_mask is None:
+            raise ValueError("流水线没有设置训练集划分（set_data 的 train_mask）")
+        return np.flatnonzero(self.train_mask[:n_samples])
+
+    def key(self, node, params=None):
+        params = params or {}
+        dependencies, _ = self.NODES[node]
+        return (node, self._own_params(node, params), tuple(self.key(dep, params) for dep in dependencies))
+
+    def get(self, node, params=None, progress=None):
+        """节点的值：命中缓存时直接返回，否则先取所需的上游节点再计算
+
+        params 可包含 n_samples（默认全部人脸）、n_components 和 solver（默认 'auto'）。
+        查找缓存在锁内进行，计算在锁外进行；同一个键正在被其他会话计算时等待其结果。
+        """
+        params = params or {}
+        with self._lock:
+            key = self.key(node, params)
+            value = self._caches[node].get(key)
+            if value is not None:
+                return value
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = getattr(self, f'_compute_{node}')(params, progress)
+        except BaseException as error:
+            with self._lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            # 计算期间 set_data 更换了数据集时结果已过期，不放入新的缓存
+            if self._pending.get(key) is future:
+                del self._pending[key]
+                self._caches[node].put(key, value)
+        future.set_result(value)
+        return value
+
+    def peek(self, node, params=None):
+        """已缓存的节点值，未计算过时返回 None（不触发计算）"""
+        with self._lock:
+            return self._caches[node].get(self.key(node, params))
+
+    def seed(self, node, params, value):
+        """直接放入节点的值（例如增量更新得到的模型）"""
+        with self._lock:
+            self._caches[node].put(self.key(node, params), value)
+
+    def info(self):
+        return {node: cache.info() for node, cache in self._caches.items()}
+
+    def _compute_data(self, params, progress=None):
+        return self.data[:self._own_params('data', params)[1]]
+
+    def _compute_mean(self, params, progress=None):
+        _report(progress, 0.0, "计算平均脸...")
+        return mean_face(self.get('data', params), self.chunk_size, self.dtype)
+
+    def _compute_centered(self, params, progress=None):
+        return CenteredFaces(self.get('data', params), self.get('mean', params, progress), self.chunk_size)
+
+    def _compute_moment(self, params, progress=None):
+        return second_moment_matrix(self.get('centered', params, progress), progress)
+
+    def _compute_eigen(self, params, progress=None):
+        solver, n_components = self._own_params('eigen', params)
+        centered = self.get('centered', params, progress)
+        moment = None if solver == 'randomized' else self.get('moment', params, progress)
+        return EigenfaceModel(self.dtype).fit_centered(centered, moment, progress,
+                                                       n_components=n_components, solver=solver)
+
+    def _compute_projection(self, params, progress=None):
+        """全部人脸在全部特征脸上的坐标 (N, r)，前 k 列就是投影到 k 个特征脸的结果"""
+        centered = self.get('centered', params, progress)
+        components = self.get('eigen', params, progress).components
+        coords = np.empty((len(centered), components.shape[1]), dtype=self.dtype)
+        for start, chunk in centered.chunks():
+            np.matmul(chunk, components, out=coords[start:start + len(chunk)])
+        return coords
+
+    def _compute_reconstruction_error(self, params, progress=None):
+        """全部人脸对 k = 0..r 的平均重建误差曲线（见 EigenfaceModel.reconstruction_errors）"""
+        model = self.get('eigen', params, progress)
+        return model.reconstruction_errors(self.get('data', params), average=True, chunk_size=self.chunk_size)
+
+    def _compute_train_eigen(self, params, progress=None):
+        """只在训练集行上拟合的特征脸模型（按块读取，不复制内存映射数据）"""
+        solver, n_components = self._own_params('train_eigen', params)
+        data = self.get('data', params)
+        return EigenfaceModel(self.dtype).fit(FaceRows(data, self._train_rows(len(data))), self.chunk_size,
+                                              progress, n_components=n_components, solver=solver)
+
+    def _compute_train_projection(self, params, progress=None):
+        """训练集和测试集人脸在训练集特征脸上的坐标 (训练坐标, 测试坐标)"""
+        data = self.get('data', params)
+        model = self.get('train_eigen', params, progress)
+        train_rows = self._train_rows(len(data))
+        test_rows = np.flatnonzero(~self.train_mask[:len(data)])
+        return (model.project(FaceRows(data, train_rows), chunk_size=self.chunk_size),
+                model.project(FaceRows(data, test_rows), chunk_size=self.chunk_size))
+
+
+# ============================================================================
+# 识别精度扫描
+# ============================================================================
+def _rank_within_label(labels):
+    """每个样本在同一标签（同一个人）中的序号：第几张图像，从 0 开始"""
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    sorted_labels = labels[order]
+    rank = np.empty(len(labels), dtype=np.intp)
+    rank[order] = np.arange(len(labels)) - np.searchsorted(sorted_labels, sorted_labels)
+    return rank
+
+
+def stratified_folds(labels, n_folds=5):
+    """按人分层划分交叉验证的折，返回每个样本的折编号 (N,)
+
+    每人的第 i 张图像归入第 i % n_folds 折：至少有两张图像的人，其测试图像所在折的训练集中
+    一定还有此人的其他图像；只有一张图像的人在训练集中没有可匹配的图像，这张图像必然识别错误。
+    n_folds 为 None 时为留一法（每张图像单独一折）。
+    """
+    if n_folds is None:
+        return np.arange(len(labels))
+    return _rank_within_label(labels) % n_folds
+
+
+def _sweep_fold(data, labels, test_mask, max_components=None, solver='auto', dtype=None):
+    """一折的精度扫描：拟合一次特征脸，用同一组特征基的前缀得到所有 k 的识别结果
+
+    前 k 个坐标的平方距离是前 k-1 个的平方距离加上第 k 维的差的平方，
+    逐维累加距离矩阵即可得到每个 k 的最近邻，不需要为每个 k 重新投影或检索。
+    返回 (每个 k 的正确数 (K,), 每个 k 的单张查询延迟 ms (K,), 测试数, 拟合 ms, 求解器)。
+    """
+    train_data, test_data = data[~test_mask], data[test_mask]
+    train_labels, test_labels = labels[~test_mask], labels[test_mask]
+    start = time.perf_counter()
+    model = EigenfaceModel(dtype).fit(train_data, n_components=max_components, solver=solver)
+    fit_ms = (time.perf_counter() - start) * 1000
+    gallery = model.project(train_data)
+    queries = model.project(test_data).astype(np.float64)
+    n_components = model.n_components
+
+    correct = np.zeros(n_components, dtype=np.int64)
+    chunk_size = max(1, (32 * 1024 * 1024) // (8 * len(gallery)))
+    for start in range(0, len(queries), chunk_size):
+        chunk = queries[start:start + chunk_size]
+        expected = test_labels[start:start + chunk_size]
+        sq_dist = np.zeros((len(chunk), len(gallery)))
+        for k in range(n_components):
+            diff = np.subtract.outer(chunk[:, k], gallery[:, k])
+            sq_dist += diff * diff
+            correct[k] += np.count_nonzero(train_labels[sq_dist.argmin(axis=1)] == expected)
+
+    # 延迟按实际的识别路径测量：投影到 k 个特征脸，再在 k 维人脸库中检索
+    latency_ms = np.empty(n_components)
+    for k in range(1, n_components + 1):
+        gallery_k = np.ascontiguousarray(gallery[:, :k])
+        sq_norms = np.einsum('ij,ij->i', gallery_k, gallery_k)
+        start = time.perf_counter()
+        knn_search(model.project(test_data, k), gallery_k, 1, gallery_sq_norms=sq_norms)
+        latency_ms[k - 1] = (time.perf_counter() - start) * 1000 / len(test_data)
+    return correct, latency_ms, len(test_data), fit_ms, model.solver
+
+
+# 进程池中每个进程只接收一次数据集（见 ProcessPoolExecutor 的 initializer）
+_sweep_dataset = None
+
+
+def _init_sweep_worker(data, labels):
+    global _sweep_dataset
+    _sweep_dataset = (data, labels)
+
+
+def _sweep_fold_worker(test_mask, max_components, solver, dtype):
+    return _sweep_fold(*_sweep_dataset, test_mask, max_components, solver, dtype)
+
+
+def accuracy_sweep(data, labels, n_folds=5, max_components=100, solver='auto', workers=None, dtype=None,
+                   tolerance=1.0, progress=None):
+    """交叉验证的识别精度-延迟曲线：k = 1..K 个特征脸的准确率和单张查询延迟
+
+    按 stratified_folds 划分（n_folds 为 None 时为留一法），每折只拟合一次特征脸，
+    所有 k 共用同一组特征基的前缀。workers > 1 时各折在进程池中并行。
+    recommended_k 为准确率不低于最高值减 tolerance 个百分点的最小 k，可作为线上使用的特征脸数量。
+    """
+    data = np.asarray(data)
+    labels = np.asarray(labels)
+    folds = stratified_folds(labels, n_folds)
+    masks = [folds == fold for fold in np.unique(folds)]
+    if workers is None:
+        workers = min(len(masks), os.cpu_count() or 1)
+
+    outputs = [None] * len(masks)
+    if workers > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_sweep_worker, initargs=(data, labels)) as executor:
+            futures = {executor.submit(_sweep_fold_worker, mask, max_components, solver, dtype): fold
+                       for fold, mask in enumerate(masks)}
+            for done, future in enumerate(as_completed(futures), 1):
+                outputs[futures[future]] = future.result()
+                _report(progress, done / len(masks), f"交叉验证 {done}/{len(masks)} 折")
+    else:
+        for fold, mask in enumerate(masks):
+            outputs[fold] = _sweep_fold(data, labels, mask, max_components, solver, dtype)
+            _report(progress, (fold + 1) / len(masks), f"交叉验证 {fold + 1}/{len(masks)} 折")
+
+    # 各折训练集的秩可能不同，取共同的 K
+    n_components = min(len(correct) for correct, *_ in outputs)
+    correct = np.array([output[0][:n_components] for output in outputs])
+    n_tests = np.array([output[2] for output in outputs])
+    fold_accuracy = correct / n_tests[:, None] * 100
+    accuracy = correct.sum(axis=0) / n_tests.sum() * 100
+    best = float(accuracy.max())
+    return {
+        'k': np.arange(1, n_components + 1),
+        'accuracy': accuracy,
+        'accuracy_std': fold_accuracy.std(axis=0),
+        'latency_ms': np.median([output[1][:n_components] for output in outputs], axis=0),
+        'fold_accuracy': fold_accuracy,
+        'n_folds': len(masks),
+        'n_tests': int(n_tests.sum()),
+        'fit_ms': float(np.median([output[3] for output in outputs])),
+        'solver': outputs[0][4],
+        'best_accuracy': best,
+        'recommended_k': int(np.argmax(accuracy >= best - tolerance)) + 1
+    }
+
+
+# ============================================================================
+# 人脸数据存储
+# ============================================================================
+FACE_IMAGE_EXTENSIONS = ('.pgm', '.png', '.jpg', '.jpeg', '.bmp')
+
+
+def generate_synthetic_faces(n_people=40, n_variants=10, shape=(10, 8), rng=None,
+                             dtype=np.float64, label_offset=0):
+    """一次性生成 人数 × 变体数 × H × W 的虚拟人脸张量
+
+    每个人有一个独特的"基础脸"，每个变体叠加随机变化（表情、光照、姿态），
+    再逐张归一化到0-1。返回 (n_people * n_variants, H*W) 的人脸矩阵和标签。
+    rng 为 np.random.Generator，为 None 时使用固定种子42以保证可重复。
+    """
+    if rng is None:
+        rng = np.random.default_rng(42)
+    height, width = shape
+    person_ids = np.arange(label_offset, label_offset + n_people)
+
+    templates = rng.standard_normal((n_people, 1, height, width), dtype=dtype) * 0.5
+    templates += ((person_ids % 5) * 0.3).astype(dtype)[:, None, None, None]
+    faces = rng.standard_normal((n_people, n_variants, height, width), dtype=dtype)
+    faces *= 0.1
+    faces += templates
+
+    # 逐张归一化到0-1范围
+    face_min = faces.min(axis=(2, 3), keepdims=True)
+    faces -= face_min
+    faces /= faces.max(axis=(2, 3), keepdims=True)
+
+    return faces.reshape(n_people * n_variants, height * width), np.repeat(person_ids, n_variants)
+
+
+def iter_synthetic_faces(n_people, n_variants=10, shape=(10, 8), chunk_people=1000, seed=42,
+                         dtype=np.float64):
+    """惰性分块生成虚拟人脸，每次产出 chunk_people 个人的 (faces, labels)
+
+    用于压力测试合成上百万张人脸而不必全部放在内存中；
+    每块使用由 (seed, 块序号) 派生的独立随机数生成器，结果可重复。
+    """
+    for chunk_id, start in enumerate(range(0, n_people, chunk_people)):
+        rng = np.random.default_rng([seed, chunk_id])
+        yield generate_synthetic_faces(min(chunk_people, n_people - start), n_variants, shape, rng,
+                                       dtype=dtype, label_offset=start)
+
+
+def image_to_face_vector(image_file, shape=None):
+    """把一张照片转成灰度人脸向量（归一化到0-1），shape 为 None 时保持原尺寸"""
+    from PIL import Image
+
+    image = Image.open(image_file).convert('L')
+    if shape is not None and image.size != (shape[1], shape[0]):
+        image = image.resize((shape[1], shape[0]), Image.BILINEAR)
+    face = np.asarray(image, dtype=np.float64)
+    face_range = face.max() - face.min()
+    face = (face - face.min()) / face_range if face_range > 0 else np.zeros_like(face)
+    return face.flatten()
+
+
+def _natural_key(name):
+    """自然排序：s2 排在 s10 之前"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def _scan_face_directory(source_dir):
+    """列出图像目录中的人物和图像文件，返回 (人物名称, 文件路径, 人物编号)"""
+    people = sorted((entry.name for entry in os.scandir(source_dir) if entry.is_dir()
+                     and not entry.name.startswith('.')), key=_natural_key)
+    files, labels = [], []
+    for person_id, person in enumerate(people):
+        person_dir = os.path.join(source_dir, person)
+        images = sorted((name for name in os.listdir(person_dir)
+                         if name.lower().endswith(FACE_IMAGE_EXTENSIONS)), key=_natural_key)
+        files.extend(os.path.join(person_dir, name) for name in images)
+        labels.extend([person_id] * len(images))
+    return people, files, labels
+
+
+def _source_signature(source_dir, people, files):
+    """图像目录的指纹：文件数和最新修改时间（含人物子目录，删除或改名图像也会更新）"""
+    paths = files + [os.path.join(source_dir, person) for person in people]
+    return {
+        'source_files': len(files),
+        'source_mtime': max((os.stat(path).st_mtime_ns for path in paths), default=0)
+    }
+
+
+def ingest_face_directory(source_dir, store_dir, shape=None):
+    """把人脸图像目录一次性写入内存映射存储
+
+    目录结构与 ORL 数据集相同：每人一个子目录（s1 … s40），子目录中是该人的图像。
+    输出：
+    - faces.npy：(N, H*W) float32 连续数组，可用 np.load(mmap_mode='r') 零拷贝加载
+    - labels.npy：(N,) 人物编号
+    - meta.json：图像尺寸、人数、人物名称和源目录指纹（文件数、最新修改时间）
+    shape 为 None 时使用第一张图像的尺寸（ORL 为 112×92），其余图像缩放到该尺寸。
+    """
+    people, files, labels = _scan_face_directory(source_dir)
+    # 导入前记录指纹，导入期间源目录发生的修改会在下次打开时重新导入
+    signature = _source_signature(source_dir, people, files)
+    if not files:
+        raise ValueError(f"在 {source_dir} 中没有找到人脸图像（需要每人一个子目录）")
+
+    if shape is None:
+        from PIL import Image
+        with Image.open(files[0]) as image:
+            shape = (image.size[1], image.size[0])
+
+    os.makedirs(store_dir, exist_ok=True)
+    faces_tmp = os.path.join(store_dir, 'faces.tmp.npy')
+    faces = np.lib.format.open_memmap(faces_tmp, mode='w+', dtype=np.float32,
+                                      shape=(len(files), shape[0] * shape[1]))
+    # 逐张写入，不在内存中保留整个数据集
+    for row, path in enumerate(files):
+        faces[row] = image_to_face_vector(path, shape)
+    faces.flush()
+    del faces
+
+    np.save(os.path.join(store_dir, 'labels.npy'), np.asarray(labels, dtype=np.int32))
+    with open(os.path.join(store_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'shape': list(shape),
+            'count': len(files),
+            'people': len(people),
+            'names': people,
+            'source': os.path.abspath(source_dir),
+            **signature
+        }, f, ensure_ascii=False, indent=2)
+    # faces.npy 最后替换，保证存储目录中只要有它就是完整的
+    os.replace(faces_tmp, os.path.join(store_dir, 'faces.npy'))
+    return load_face_store(store_dir)
+
+
+def load_face_store(store_dir):
+    """加载内存映射人脸存储，返回与 _generate_virtual_faces 相同格式的数据"""
+    with open(os.path.join(store_dir, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    data = np.load(os.path.join(store_dir, 'faces.npy'), mmap_mode='r')
+    labels = np.load(os.path.join(store_dir, 'labels.npy'))
+    labels.setflags(write=False)
+    return {
+        'data': data,
+        'labels': labels,
+        'shape': tuple(meta['shape']),
+        'count': meta['count'],
+        'people': meta['people'],
+        'names': meta['names']
+    }
+
+
+def open_face_dataset(path):
+    """打开人脸数据集：path 是存储目录则直接加载，是图像目录则先导入到 path/.face_store
+
+    图像目录的文件数或最新修改时间与存储中记录的不一致时重新导入。
+    """
+    if os.path.exists(os.path.join(path, 'faces.npy')):
+        return load_face_store(path)
+    store_dir = os.path.join(path, '.face_store')
+    if os.path.exists(os.path.join(store_dir, 'faces.npy')):
+        with open(os.path.join(store_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        people, files, _ = _scan_face_directory(path)
+        signature = _source_signature(path, people, files)
+        if all(meta.get(key) == value for key, value in signature.items()):
+            return load_face_store(store_dir)
+    return ingest_face_directory(path, store_dir)
+
+
+# ============================================================================
+# 人脸库检索索引
+# ============================================================================
+class BruteForceIndex:
+    """暴力检索（精确），作为其他索引的基准"""
+
+    name = 'brute'
+
+    def __init__(self, gallery):
+        self.gallery = np.asarray(gallery)
+        self._sq_norms = np.einsum('ij,ij->i', self.gallery, self.gallery)
+
+    def search(self, queries, k=1):
+        return knn_search(queries, self.gallery, k, gallery_sq_norms=self._sq_norms)
+
+
+class KDTreeIndex:
+    """KD 树索引（精确），适合投影维度较低（k ≲ 10）的情形"""
+
+    name = 'kdtree'
+
+    def __init__(self, gallery, leaf_size=40):
+        KDTree = _kdtree()
+        if KDTree is None:
+            raise ImportError("KD 树索引需要安装 scikit-learn")
+        self._tree = KDTree(np.asarray(gallery), leaf_size=leaf_size)
+
+    def search(self, queries, k=1):
+        distances, indices = self._tree.query(np.atleast_2d(queries), k=k)
+        return indices, distances
+
+
+class IVFIndex:
+    """倒排文件索引：用粗量化器（k-means）把人脸库划分为若干簇
+
+    查询时只在距离最近的 n_probe 个簇中搜索（近似）；
+    n_probe 等于簇数时退化为精确搜索。
+    """
+
+    name = 'ivf'
+
+    def __init__(self, gallery, n_lists=None, n_probe=8, n_iter=10, sample_size=20000, seed=42):
+        self.gallery = np.asarray(gallery)
+        n_gallery = len(self.gallery)
+        self.n_lists = n_lists or max(1, int(np.sqrt(n_gallery)))
+        self.n_probe = n_probe
+        self.centroids = self._train_quantizer(n_iter, sample_size, np.random.default_rng(seed))
+
+        # 倒排表：每个簇保存其成员在人脸库中的下标
+        assignment = knn_search(self.gallery, self.centroids, k=1)[0][:, 0]
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(self.n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+        self.list_sizes = np.diff(bounds)
+
+    def _train_quantizer(self, n_iter, sample_size, rng):
+        n_gallery = len(self.gallery)
+        sample = self.gallery[rng.choice(n_gallery, min(sample_size, n_gallery), replace=False)]
+        # 质心与人脸库同精度，便于后续距离计算；簇内求和用 float64
+        centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].astype(
+            np.result_type(self.gallery.dtype, np.float32))
+        for _ in range(n_iter):
+            assignment = knn_search(sample, centroids, k=1)[0][:, 0]
+            counts = np.bincount(assignment, minlength=self.n_lists)
+            sums = np.zeros(centroids.shape)
+            np.add.at(sums, assignment, sample)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        return centroids
+
+    def search(self, queries, k=1, n_probe=None, exact=False):
+        """在最近的 n_probe 个簇中检索；这些簇的成员不足 k 个时继续探查下一个最近的簇，
+        保证每个查询都返回 k 个真实的近邻（k 不超过人脸库大小）"""
+        queries = np.atleast_2d(np.asarray(queries))
+        k = min(k, len(self.gallery))
+        n_probe = self.n_lists if exact else min(n_probe or self.n_probe, self.n_lists)
+        # 全部簇按与查询的距离排序（簇数只有 √N 量级），累计成员数达到 k 之前的簇都要探查
+        ranked = knn_search(queries, self.centroids, k=self.n_lists)[0]
+        covered = np.cumsum(self.list_sizes[ranked], axis=1)
+        needed = np.maximum(n_probe, np.minimum((covered < k).sum(axis=1) + 1, self.n_lists))
+        probed = np.zeros((len(queries), self.n_lists), dtype=bool)
+        rows, ranks = np.nonzero(np.arange(self.n_lists) < needed[:, None])
+        probed[rows, ranked[rows, ranks]] = True
+
+        best_idx = np.full((len(queries), k), -1, dtype=np.intp)
+        best_dist = np.full((len(queries), k), np.inf)
+        # 按簇分组处理查询，每个簇内部是一次批量距离计算
+        for list_id, members in enumerate(self.lists):
+            query_ids = np.nonzero(probed[:, list_id])[0]
+            if len(query_ids) == 0 or len(members) == 0:
+                continue
+            idx, dist = knn_search(queries[query_ids], self.gallery[members], k)
+            merged_idx = np.concatenate([best_idx[query_ids], members[idx]], axis=1)
+            merged_dist = np.concatenate([best_dist[query_ids], dist], axis=1)
+            order = np.argsort(merged_dist, axis=1)[:, :k]
+            best_idx[query_ids] = np.take_along_axis(merged_idx, order, axis=1)
+            best_dist[query_ids] = np.take_along_axis(merged_dist, order, axis=1)
+        return best_idx, best_dist
+
+
+GALLERY_INDEXES = {
+    'brute': BruteForceIndex,
+    'kdtree': KDTreeIndex,
+    'ivf': IVFIndex,
+}
+
+
+def build_gallery_index(gallery, method='auto', **kwargs):
+    """为投影后的人脸库建立检索索引
+
+    method='auto' 时：低维（≤10）且安装了 scikit-learn 用 KD 树，
+    大规模人脸库（≥10000）用倒排索引，其余用暴力检索。
+    """
+    gallery = np.asarray(gallery)
+    if method == 'auto':
+        if gallery.shape[1] <= 10 and _kdtree() is not None:
+            method = 'kdtree'
+        elif len(gallery) >= 10000:
+            method = 'ivf'
+        else:
+            method = 'brute'
+    if method not in GALLERY_INDEXES:
+        raise ValueError(f"未知的索引类型: {method}")
+    return GALLERY_INDEXES[method](gallery, **kwargs)
+
+
+def make_synthetic_gallery(n_identities=100000, dim=50, n_queries=1000, spread=3.0, noise=0.5, seed=42):
+    """在特征脸空间中合成大规模人脸库（每个身份一张登记照）和对应的查询"""
+    rng = np.random.default_rng(seed)
+    # 特征脸坐标的方差随维度衰减
+    scale = spread * np.exp(-np.arange(dim) / (dim / 3))
+    gallery = rng.standard_normal((n_identities, dim)) * scale
+    query_ids = rng.choice(n_identities, n_queries, replace=False)
+    queries = gallery[query_ids] + rng.standard_normal((n_queries, dim)) * noise * scale
+    return gallery, queries, query_ids
+
+
+def benchmark_gallery_index(n_identities=100000, dim=50, n_queries=1000, k=10,
+                            n_probe_list=(1, 2, 4, 8, 16, 32), seed=42):
+    """对比各索引与暴力检索的召回率和查询延迟
+
+    返回每种配置一行的列表：method, n_probe, build_s, query_ms（每次查询）, recall（recall@k）
+    """
+    gallery, queries, _ = make_synthetic_gallery(n_identities, dim, n_queries, seed=seed)
+
+    def timed(func):
+        start = time.perf_counter()
+        value = func()
+        return value, time.perf_counter() - start
+
+    brute, build_s = timed(lambda: BruteForceIndex(gallery))
+    (truth, _), query_s = timed(lambda: brute.search(queries, k))
+    rows = [{'method': 'brute', 'n_probe': None, 'build_s': build_s,
+             'query_ms': query_s / n_queries * 1000, 'recall': 1.0}]
+
+    def recall(found):
+        hits = (found[:, :, None] == truth[:, None, :]).any(axis=2)
+        return float(hits.mean())
+
+    if _kdtree() is not None and dim <= 20:
+        tree, build_s = timed(lambda: KDTreeIndex(gallery))
+        (found, _), query_s = timed(lambda: tree.search(queries, k))
+        rows.append({'method': 'kdtree', 'n_probe': None, 'build_s': build_s,
+                     'query_ms': query_s / n_queries * 1000, 'recall': recall(found)})
+
+    ivf, build_s = timed(lambda: IVFIndex(gallery, seed=seed))
+    for n_probe in n_probe_list:
+        (found, _), query_s = timed(lambda: ivf.search(queries, k, n_probe=n_probe))
+        rows.append({'method': 'ivf', 'n_probe': n_probe, 'build_s': build_s,
+                     'query_ms': query_s / n_queries * 1000, 'recall': recall(found)})
+    return rows
+
+
+# ============================================================================
+# 缓存工具
+# ============================================================================
+# 侧边栏可选的图像分辨率 (高, 宽)，最大为 ORL 数据集的 112×92
+RESOLUTIONS = [(10, 8), (28, 23), (56, 46), (112, 92)]
+# 渲染图像的编码格式（webp 体积更小，不支持时回退到 png）
+FIGURE_FORMAT = os.environ.get('FACE_LAB_FIGURE_FORMAT', 'webp')
+FIGURE_DPI = 100
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存，带命中统计和可选的总字节数上限"""
+
+    def __init__(self, maxsize=32, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._nbytes -= self._sizes[key]
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            self._nbytes += size
+            while self._data and (len(self._data) > self.maxsize or
+                                  (self.max_bytes is not None and self._nbytes > self.max_bytes)):
+                old_key, _ = self._data.popitem(last=False)
+                self._nbytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'nbytes': self._nbytes
+            }
+
+
+def encode_figure(fig, fmt=FIGURE_FORMAT, dpi=FIGURE_DPI):
+    """将 matplotlib 图像编码为压缩的图片字节，并立即关闭图像释放内存"""
+    try:
+        buffer = BytesIO()
+        try:
+            fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight')
+        except ValueError:
+            # 旧版 matplotlib 不支持 webp
+            buffer = BytesIO()
+            fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        _pyplot().close(fig)
+
+
+def _images_nbytes(images):
+    return sum(len(image) for image in images) if isinstance(images, tuple) else len(images)
+
+
+# ============================================================================
+# 浏览器端图表
+# ============================================================================
+VEGA_LITE_SCHEMA = 'https://vega.github.io/schema/vega-lite/v5.json'
+
+# 数据类图表可以只发送数据、由浏览器渲染（缩放、悬停提示不再需要服务端重绘）
+# viz 方法名 → (生成 Vega-Lite 规格的方法名, 仍需在服务端绘制的部分，None 表示无)
+CLIENT_CHARTS = {
+    '_viz_centering': ('_chart_centering', None),
+    '_viz_covariance': ('_chart_covariance', None),
+    '_viz_reconstruction': ('_chart_reconstruction', '_viz_reconstruction_faces'),
+    '_viz_face_recognition': ('_chart_face_recognition', None)
+}
+
+
+def _chart_records(columns, **constants):
+    """把若干等长数组转换为 Vega-Lite 的 data.values 记录（浮点保留 4 位小数以减小体积）"""
+    columns = {name: np.round(np.asarray(values, dtype=np.float64), 4).tolist()
+               if np.asarray(values).dtype.kind == 'f' else np.asarray(values).tolist()
+               for name, values in columns.items()}
+    length = len(next(iter(columns.values())))
+    return [dict(constants, **{name: values[i] for name, values in columns.items()})
+            for i in range(length)]
+
+
+def _point_layer(values, color='类型', size=60, shape=None):
+    layer = {
+        'data': {'values': values},
+        'mark': {'type': 'point', 'filled': True, 'size': size, 'tooltip': True},
+        'encoding': {
+            'x': {'field': 'x', 'type': 'quantitative'},
+            'y': {'field': 'y', 'type': 'quantitative'},
+            'color': {'field': color, 'type': 'nominal'}
+        }
+    }
+    if shape:
+        layer['mark']['shape'] = shape
+    return layer
+
+
+def _chart(title, layers, x_title=None, y_title=None, **extra):
+    """组装一个分层图表；第一层绑定滚轮缩放和拖动平移"""
+    layers = [dict(layer) for layer in layers]
+    for layer in layers:
+        encoding = layer.get('encoding', {})
+        if 'x' in encoding and x_title:
+            encoding['x'] = dict(encoding['x'], title=x_title)
+        if 'y' in encoding and y_title:
+            encoding['y'] = dict(encoding['y'], title=y_title)
+    layers[0]['params'] = [{'name': 'zoom', 'select': 'interval', 'bind': 'scales'}]
+    return dict({'$schema': VEGA_LITE_SCHEMA, 'title': title, 'layer': layers}, **extra)
+
+
+# ============================================================================
+# 性能监测
+# ============================================================================
+class LabProfiler:
+    """分层计时器：记录计算、绘图、编码和 Streamlit 渲染各层的耗时
+
+    每个 (层, 名称) 保留最近 window 次样本，可在多个会话之间共享。
+    开启内存追踪后额外用 tracemalloc 记录每次调用的峰值内存增量
+    （tracemalloc 是进程级的，并发调用时峰值只是近似值）。
+    """
+
+    # 直方图桶的上界（毫秒），最后一个桶收集更慢的样本
+    BUCKETS_MS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000)
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.trace_memory = False
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def enable_memory_tracing(self, enabled=True):
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = enabled
+
+    @contextmanager
+    def timer(self, layer, name):
+        trace = self.trace_memory and tracemalloc.is_tracing()
+        if trace:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - baseline if trace else None
+            self.record(layer, name, elapsed, peak)
+
+    def record(self, layer, name, seconds, peak_bytes=None):
+        with self._lock:
+            samples = self._samples.get((layer, name))
+            if samples is None:
+                samples = self._samples[(layer, name)] = deque(maxlen=self.window)
+            samples.append((seconds, peak_bytes))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """每个 (层, 名称) 的统计和直方图，按总耗时降序"""
+        with self._lock:
+            snapshot = {key: list(samples) for key, samples in self._samples.items()}
+        rows = []
+        for (layer, name), samples in snapshot.items():
+            ms = np.array([seconds for seconds, _ in samples]) * 1000
+            peaks = [peak for _, peak in samples if peak is not None]
+            counts = np.bincount(np.searchsorted(self.BUCKETS_MS, ms), minlength=len(self.BUCKETS_MS) + 1)
+            rows.append({
+                'layer': layer,
+                'name': name,
+                'count': len(ms),
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'max_ms': float(ms.max()),
+                'total_ms': float(ms.sum()),
+                'peak_kb': max(peaks) / 1024 if peaks else None,
+                'histogram': counts.tolist()
+            })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def to_json(self):
+        return json.dumps({
+            'buckets_ms': list(self.BUCKETS_MS),
+            'window': self.window,
+            'trace_memory': self.trace_memory,
+            'stats': self.summary()
+        }, ensure_ascii=False, indent=2)
+
+
+# ============================================================================
+# 进程池渲染
+# ============================================================================
+class RenderBusyError(RuntimeError):
+    """渲染队列已满或渲染超时"""
+
+
+# 渲染子进程内复用的实验室对象（_viz_* 只用到传入的数值参数）
+_worker_lab = None
+
+
+def _render_worker(method, args, fmt):
+    """在渲染子进程中执行 _viz_* 并编码，返回 (图片字节, 绘图秒数, 编码秒数)"""
+    global _worker_lab
+    if _worker_lab is None:
+        _worker_lab = VirtualFaceLab(result_cache_size=1, figure_cache_bytes=0)
+    start = time.perf_counter()
+    figures = getattr(_worker_lab, method)(*args)
+    plot_s = time.perf_counter() - start
+    start = time.perf_counter()
+    if isinstance(figures, tuple):
+        images = tuple(encode_figure(fig, fmt) for fig in figures)
+    else:
+        images = encode_figure(figures, fmt)
+    return images, plot_s, time.perf_counter() - start
+
+
+class FigureRenderPool:
+    """有界的绘图进程池
+
+    pyplot 不是线程安全的，且绘图受 GIL 限制；把渲染放到独立进程中，
+    多个会话的重跑可以并行利用多核。子进程只接收数值参数，返回图片字节。
+    排队（含执行中）的任务超过 max_pending 或单次等待超过 timeout 秒时抛出 RenderBusyError。
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, timeout=30.0):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending or 4 * self.max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn：Streamlit 进程中有多个线程，fork 可能复制到被持有的锁
+                self._executor = ProcessPoolExecutor(self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def render(self, method, args, fmt=FIGURE_FORMAT):
+        """渲染一个 viz_spec，返回 (图片字节, 绘图秒数, 编码秒数)"""
+        if not self._slots.acquire(blocking=False):
+            raise RenderBusyError(f"渲染队列已满（{self.max_pending} 个任务），请稍后重试")
+        try:
+            future = self._get_executor().submit(_render_worker, method, args, fmt)
+        except BaseException:
+            self._slots.release()
+            raise
+        # 超时后任务仍在子进程中执行，完成时才释放名额，排队深度因此保持有界
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            raise RenderBusyError(f"渲染超过 {self.timeout:g} 秒，请稍后重试") from None
+        except BrokenProcessPool:
+            # 子进程异常退出（如内存不足），丢弃进程池，下次调用时重建
+            with self._lock:
+                self._executor = None
+            raise RenderBusyError("渲染进程异常退出，请重试") from None
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# ============================================================================
+# 预计算缓存
+# ============================================================================
+PRECOMPUTE_VERSION = 4
+# 数组在数据文件中的对齐字节数
+_BLOB_ALIGN = 64
+
+
+def _pack(obj, write, seen):
+    """把实验结果转换为 JSON 结构，数组和图片字节通过 write(bytes) 写入数据文件
+
+    seen 按 id 记录已写入的数组，结果和 viz_spec 共用的数组只保存一份。
+    """
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            raise TypeError("预计算缓存不支持 object 数组")
+        ref = seen.get(id(obj))
+        if ref is None:
+            array = np.ascontiguousarray(obj)
+            ref = seen[id(obj)] = [write(array.tobytes()), array.dtype.str, list(array.shape)]
+        return {'$array': ref}
+    if isinstance(obj, bytes):
+        return {'$bytes': [write(obj), len(obj)]}
+    if isinstance(obj, tuple):
+        return {'$tuple': [_pack(value, write, seen) for value in obj]}
+    if isinstance(obj, list):
+        return [_pack(value, write, seen) for value in obj]
+    if isinstance(obj, dict):
+        if all(isinstance(key, str) for key in obj):
+            return {key: _pack(value, write, seen) for key, value in obj.items()}
+        return {'$dict': [[_pack(key, write, seen), _pack(value, write, seen)] for key, value in obj.items()]}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    raise TypeError(f"预计算缓存不支持 {type(obj).__name__}")
+
+
+def _unpack(obj, buffer):
+    """_pack 的逆操作；数组是内存映射数据文件上的只读视图（零拷贝）"""
+    if isinstance(obj, list):
+        return [_unpack(value, buffer) for value in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if '$array' in obj:
+        offset, dtype, shape = obj['$array']
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape, dtype=np.int64))
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+    if '$bytes' in obj:
+        offset, length = obj['$bytes']
+        return bytes(buffer[offset:offset + length])
+    if '$tuple' in obj:
+        return tuple(_unpack(value, buffer) for value in obj['$tuple'])
+    if '$dict' in obj:
+        return {_unpack(key, buffer): _unpack(value, buffer) for key, value in obj['$dict']}
+    return {key: _unpack(value, buffer) for key, value in obj.items()}
+
+
+def _precompute_key(experiment_id, params, *extra):
+    return json.dumps([experiment_id, sorted(params.items()), *extra], ensure_ascii=False)
+
+
+class PrecomputedStore:
+    """预计算的实验结果和图像（由 VirtualFaceLab.precompute 写入）
+
+    目录中 index.json 保存每个 (实验, 参数) 的结果结构，数组和图片字节保存在 data.bin 中，
+    打开时以只读方式内存映射，条目在第一次访问时才解包。
+    """
+
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, 'index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != PRECOMPUTE_VERSION:
+            raise ValueError(f"预计算缓存版本不匹配: {index.get('version')}")
+        self.store_dir = store_dir
+        self.fingerprint = index['fingerprint']
+        self.meta = index['meta']
+        self._results = index['results']
+        self._figures = index['figures']
+        with open(os.path.join(store_dir, 'data.bin'), 'rb') as f:
+            # 空文件不能映射（没有任何数组时）
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size \
+                else b''
+
+    def __len__(self):
+        return len(self._results)
+
+    def result(self, experiment_id, params):
+        packed = self._results.get(_precompute_key(experiment_id, params))
+        return None if packed is None else _unpack(packed, self._buffer)
+
+    def figure(self, experiment_id, params, method, fmt):
+        packed = self._figures.get(_precompute_key(experiment_id, params, method, fmt))
+        return None if packed is None else _unpack(packed, self._buffer)
+
+
+# ============================================================================
+# 虚拟实验室类
+# ============================================================================
+# 各实验使用的参数及默认值，用于规范化结果缓存的键
+EXPERIMENT_PARAMS = {
+    2: {'n_samples': 5},
+    3: {'n_samples': 20},
+    4: {'n_samples': None},
+    6: {'n_eigenfaces': 5, 'solver': 'auto'},
+    7: {'n_components': 3, 'solver': 'auto'},
+    8: {'n_components': 20, 'solver': 'auto'},
+    9: {'n_components': 10, 'index': 'brute', 'solver': 'auto'},
+    10: {'n_components': 50, 'solver': 'auto'},
+}
+
+# 各参数的合法取值：整数参数为最小值，其余为可选值（默认值为 None 的参数也可以取 None）
+PARAM_LIMITS = {
+    'n_samples': 2,
+    'n_eigenfaces': 1,
+    'n_components': 1,
+    'solver': ('auto',) + SOLVERS,
+    'index': ('auto',) + tuple(GALLERY_INDEXES),
+}
+
+
+def check_experiment_params(experiment_id, params):
+    """检查外部传入的实验参数（如 HTTP 请求），取值超出范围时抛出 ValueError"""
+    if params is None:
+        return
+    if not isinstance(params, dict):
+        raise ValueError(f"params 应为对象，收到 {type(params).__name__}")
+    for name, default in EXPERIMENT_PARAMS.get(experiment_id, {}).items():
+        value = params.get(name, default)
+        limit = PARAM_LIMITS[name]
+        if value is None and default is None:
+            continue
+        if isinstance(limit, tuple):
+            if value not in limit:
+                raise ValueError(f"参数 {name} 应为 {', '.join(limit)} 之一，收到 {value!r}")
+        elif isinstance(value, bool) or not isinstance(value, (int, np.integer)) or value < limit:
+            raise ValueError(f"参数 {name} 应为不小于 {limit} 的整数，收到 {value!r}")
+
+
+# 侧边栏各参数的全部取值（与 virtual_lab.py 中的滑块一致），预计算时逐一枚举
+PARAM_GRID = {
+    2: {'n_samples': range(2, 21)},
+    6: {'n_eigenfaces': range(1, 21)},
+    7: {'n_components': range(1, 11)},
+    8: {'n_components': range(1, 81)},
+    9: {'index': ['brute', 'kdtree', 'ivf']}
+}
+# 可以预计算的实验；实验10展示的是当场测量的耗时，预计算会把生成机器上的计时当作现场结果回放
+PRECOMPUTED_EXPERIMENTS = range(1, 10)
+
+
+def iter_param_grid(experiments=range(1, 11), grid=PARAM_GRID):
+    """枚举 (实验编号, 参数) 组合；没有参数的实验只有一个组合"""
+    for experiment_id in experiments:
+        names = list(grid.get(experiment_id, {}))
+        values = [list(grid[experiment_id][name]) for name in names]
+        for combination in itertools.product(*values):
+            yield experiment_id, dict(zip(names, combination))
+
+
+class VirtualFaceLab:
+    """虚拟人脸识别实验室"""
+    
+    def __init__(self, result_cache_size=32, figure_cache_bytes=64 * 1024 * 1024, profiler=None,
+                 render_pool=None, dtype=None):
+        self.current_experiment = 1
+        # 虚拟人脸和特征脸模型的计算精度，默认 COMPUTE_DTYPE
+        self.dtype = np.dtype(dtype or COMPUTE_DTYPE)
+        self.simulation_data = {}
+        self.animation_running = False
+        self.dataset_version = 0
+        self.profiler = profiler or LabProfiler()
+        # 为 None 时在当前线程中绘图（命令行和基准测试），否则交给 FigureRenderPool
+        self.render_pool = render_pool
+        # (PrecomputedStore, 对应的数据集版本)，见 load_precomputed
+        self._precomputed = None
+        # 实验室对象会被多个会话共享，登记新人脸时替换数据集需要加锁
+        self._model_lock = threading.Lock()
+        # 平均脸、协方差、特征分解和投影等中间结果由流水线统一缓存，各实验共享
+        self.pipeline = LabPipeline(dtype=self.dtype)
+        
+        # 计算结果和渲染图像分别缓存（LRU），键为 (实验编号, 规范化参数, 数据集版本)
+        self._result_cache = LRUCache(maxsize=result_cache_size)
+        self._figure_cache = LRUCache(maxsize=4 * result_cache_size,
+                                      max_bytes=figure_cache_bytes,
+                                      sizeof=_images_nbytes)
+        
+    def setup_lab(self, dataset_dir=None, shape=(10, 8), n_people=40, n_variants=10):
+        """设置实验室环境
+
+        dataset_dir 为人脸图像目录（ORL 结构）或已导入的存储目录；
+        为 None 时生成 n_people × n_variants 张 shape 尺寸的虚拟人脸。
+        虚拟人脸由固定种子的独立 Generator 生成，不修改全局随机状态。
+        """
+        # 创建模拟数据
+        if dataset_dir:
+            faces = open_face_dataset(dataset_dir)
+        else:
+            faces = self._generate_virtual_faces(n_people, n_variants, shape)
+        self.simulation_data = {
+            'faces': faces,
+            'experiment_results': {},
+            'student_actions': [],
+            'learning_progress': 0
+        }
+        self.pipeline.set_data(faces['data'], self._train_mask(faces['labels']))
+        self.dataset_version += 1
+        
+        return True
+
+    @staticmethod
+    def _model_params(n_components=None, solver='auto'):
+        """流水线中特征分解节点的参数（全部人脸）"""
+        return {'n_components': n_components, 'solver': solver}
+
+    def get_eigen_model(self, progress=None, n_components=None, solver='auto'):
+        """获取特征脸模型（来自共享的计算流水线，每个数据集只拟合一次）
+
+        默认返回完整分解的共享模型。指定 n_components 时按 solver 选择求解器：
+        选中 eigh 时直接复用共享模型，否则拟合只含前 n_components 个特征脸的截断模型
+        （流水线按 (求解器, k) 缓存最近的几个）。
+        """
+        return self.pipeline.get('eigen', self._model_params(n_components, solver), progress)
+    
+    def _solver_info(self, model, n_components, node='eigen'):
+        """实验结果中的求解器信息；截断求解时与流水线节点 node 已有的完整分解比较精度
+
+        完整模型尚未拟合时不做比较（避免为了检查而付出完整分解的代价）。
+        """
+        info = {'solver': model.solver}
+        full_model = self.pipeline.peek(node)
+        if full_model is not None and model is not full_model:
+            info['solver_check'] = _solver_accuracy(model, full_model, n_components)
+        return info
+
+    def accuracy_sweep(self, n_folds=5, max_components=100, solver='auto', workers=None, progress=None):
+        """当前数据集上的交叉验证精度-延迟曲线（见 accuracy_sweep），按参数和数据集版本缓存"""
+        key = ('accuracy_sweep', n_folds, max_components, solver, self.dataset_version)
+        result = self._result_cache.get(key)
+        if result is None:
+            faces = self.simulation_data['faces']
+            result = accuracy_sweep(faces['data'], faces['labels'], n_folds, max_components, solver,
+                                    workers, self.dtype, progress=progress)
+            self._result_cache.put(key, result)
+        return result
+
+    def enroll_faces(self, new_faces, new_labels=None, check_drift=False):
+        """登记新人脸：追加到数据集并增量更新特征脸模型
+
+        new_faces 形状为 (n, D)，与现有人脸同尺寸、同归一化。
+        new_labels 为 None 时把这批人脸登记为一个新人物，标签在锁内分配，
+        多个会话同时登记也不会得到相同的标签。
+        返回 {'labels': 登记使用的标签, 'drift': 偏差}；check_drift=True 时额外做一次全量拟合，
+        drift 为增量模型与之的偏差，否则为 None。
+        """
+        new_faces = np.atleast_2d(np.asarray(new_faces, dtype=self.simulation_data['faces']['data'].dtype))
+        if new_faces.shape[1] != self.simulation_data['faces']['data'].shape[1]:
+            raise ValueError("新人脸的维度与数据集不一致")
+
+        with self._model_lock:
+            # 模型和数据必须在同一把锁内读取，否则并发登记时会把批次并入过期的模型
+            old_model = self.get_eigen_model()
+            faces = self.simulation_data['faces']
+            if new_labels is None:
+                new_labels = np.full(len(new_faces), faces['labels'].max() + 1, dtype=faces['labels'].dtype)
+            new_labels = np.atleast_1d(np.asarray(new_labels))
+            data = np.concatenate([faces['data'], new_faces])
+            labels = np.concatenate([faces['labels'], new_labels])
+            data.setflags(write=False)
+            labels.setflags(write=False)
+
+            # 在副本上更新，正在读取旧模型的会话不受影响
+            model = copy.copy(old_model).partial_fit(new_faces)
+            self.pipeline.set_data(data, self._train_mask(labels))
+            self.pipeline.seed('eigen', None, model)
+            self.simulation_data['faces'] = dict(
+                faces,
+                data=data,
+                labels=labels,
+                count=len(data),
+                people=len(np.unique(labels))
+            )
+            self.dataset_version += 1
+
+        drift = model.drift_from(EigenfaceModel(self.dtype).fit(data)) if check_drift else None
+        return {'labels': new_labels, 'drift': drift}
+
+    def _generate_virtual_faces(self, n_people=40, n_variants=10, shape=(10, 8), rng=None):
+        """生成虚拟人脸数据"""
+        # 模拟40个人，每人10张不同表情/姿态
+        faces, labels = generate_synthetic_faces(n_people, n_variants, shape, rng, dtype=self.dtype)
+        
+        # 数据集在会话之间共享，设为只读防止被意外修改
+        faces.setflags(write=False)
+        labels.setflags(write=False)
+        
+        return {
+            'data': faces,
+            'labels': labels,
+            'shape': tuple(shape),
+            'count': len(faces),
+            'people': n_people
+        }
+    
+    def run_experiment(self, experiment_id, params=None, progress=None, charts=False):
+        """运行虚拟实验：计算结果和渲染图像分别缓存
+
+        progress(fraction, message) 为可选的进度回调，用于报告真实的计算阶段。
+        charts=True 时数据类图表（见 CLIENT_CHARTS）以 Vega-Lite 规格返回在 result['charts'] 中，
+        只有人脸图像等仍在服务端绘制。
+        """
+        params = self._normalize_params(experiment_id, params)
+        result = self.compute_experiment(experiment_id, params, _sub_progress(progress, 0.0, 0.8))
+        viz_spec = result.get('viz_spec')
+        if viz_spec is not None:
+            _report(progress, 0.8, "绘制图像...")
+            key = self._cache_key(experiment_id, params)
+            method, args = viz_spec
+            if charts and method in CLIENT_CHARTS:
+                chart_method, method = CLIENT_CHARTS[method]
+                result['charts'] = self.render_charts(key, (chart_method, args))
+            try:
+                if method is not None:
+                    result['visualization'] = self.render_visualization(key, (method, args))
+            except RenderBusyError as error:
+                # 数值结果照常返回，图像留给下一次重跑
+                result['render_error'] = str(error)
+        _report(progress, 1.0, "完成")
+        return result
+    
+    def compute_experiment(self, experiment_id, params=None, progress=None):
+        """计算实验的数值结果（不渲染图像），结果按实验编号和参数缓存"""
+        params = self._normalize_params(experiment_id, params)
+        key = self._cache_key(experiment_id, params)
+        
+        result = self._result_cache.get(key)
+        if result is None:
+            store = self._precomputed_store(key)
+            result = store and store.result(experiment_id, params)
+            if result is not None:
+                self._result_cache.put(key, result)
+        if result is None:
+            with self.profiler.timer('compute', f'exp{experiment_id}'):
+                result = self._run_experiment(experiment_id, params, progress)
+            if 'error' in result:
+                return result
+            self._result_cache.put(key, result)
+        return dict(result)
+    
+    def render_visualization(self, key, viz_spec, fmt=FIGURE_FORMAT):
+        """把可视化渲染成图片字节；同一 (实验, 参数) 只渲染一次"""
+        method, args = viz_spec
+        cache_key = (key, method, fmt)
+        images = self._figure_cache.get(cache_key)
+        if images is None:
+            store = self._precomputed_store(key)
+            images = store and store.figure(key[0], dict(key[1]), method, fmt)
+            if images is not None:
+                self._figure_cache.put(cache_key, images)
+        if images is None:
+            if self.render_pool is not None:
+                images, plot_s, encode_s = self.render_pool.render(method, args, fmt)
+                self.profiler.record('plot', method, plot_s)
+                self.profiler.record('encode', method, encode_s)
+            else:
+                with self.profiler.timer('plot', method):
+                    figures = getattr(self, method)(*args)
+                with self.profiler.timer('encode', method):
+                    if isinstance(figures, tuple):
+                        images = tuple(encode_figure(fig, fmt) for fig in figures)
+                    else:
+                        images = encode_figure(figures, fmt)
+            self._figure_cache.put(cache_key, images)
+        return images
+    
+    def render_charts(self, key, chart_spec):
+        """生成浏览器端图表的 Vega-Lite 规格（JSON 文本的元组），与图像共用缓存"""
+        method, args = chart_spec
+        cache_key = (key, method, 'vega-lite')
+        charts = self._figure_cache.get(cache_key)
+        if charts is None:
+            store = self._precomputed_store(key)
+            charts = store and store.figure(key[0], dict(key[1]), method, 'vega-lite')
+            if charts is not None:
+                self._figure_cache.put(cache_key, charts)
+        if charts is None:
+            with self.profiler.timer('chart', method):
+                charts = tuple(json.dumps(spec, ensure_ascii=False, separators=(',', ':'))
+                               for spec in getattr(self, method)(*args))
+            self._figure_cache.put(cache_key, charts)
+        return charts
+    
+    # ============================================================================
+    # 预计算缓存
+    # ============================================================================
+    def dataset_fingerprint(self):
+        """数据集指纹：尺寸、计算精度、标签和抽样的人脸行（大数据集不必整体哈希）"""
+        faces = self.simulation_data['faces']
+        data = faces['data']
+        step = max(1, len(data) // 256)
+        digest = hashlib.sha1(json.dumps([list(faces['shape']), list(data.shape), self.dtype.name]).encode())
+        digest.update(np.ascontiguousarray(faces['labels']).tobytes())
+        digest.update(np.ascontiguousarray(data[::step], dtype=np.float32).tobytes())
+        return digest.hexdigest()
+    
+    def precompute(self, store_dir, experiments=PRECOMPUTED_EXPERIMENTS, grid=PARAM_GRID, fmt=FIGURE_FORMAT,
+                   workers=1, progress=None):
+        """预先计算所有 (实验, 参数) 组合的结果、图像和浏览器端图表，写入 store_dir
+
+        不在 PRECOMPUTED_EXPERIMENTS 中的实验（实验10）跳过，始终现场计算。
+        workers > 1 时用多个线程提交任务（绘图是否并行取决于 render_pool）。
+        返回写入的组合数。
+        """
+        experiments = [experiment_id for experiment_id in experiments
+                       if experiment_id in PRECOMPUTED_EXPERIMENTS]
+        tasks = list(iter_param_grid(experiments, grid))
+        os.makedirs(store_dir, exist_ok=True)
+        data_tmp = os.path.join(store_dir, 'data.tmp.bin')
+        results, figures = {}, {}
+        
+        def evaluate(task):
+            experiment_id, params = task
+            params = self._normalize_params(experiment_id, params)
+            result = self.compute_experiment(experiment_id, params)
+            key = self._cache_key(experiment_id, params)
+            rendered = {}
+            viz_spec = result.get('viz_spec')
+            if viz_spec is not None:
+                method, args = viz_spec
+                rendered[(method, fmt)] = self.render_visualization(key, viz_spec, fmt)
+                if method in CLIENT_CHARTS:
+                    chart_method, faces_method = CLIENT_CHARTS[method]
+                    rendered[(chart_method, 'vega-lite')] = self.render_charts(key, (chart_method, args))
+                    if faces_method is not None:
+                        rendered[(faces_method, fmt)] = self.render_visualization(key, (faces_method, args), fmt)
+            return experiment_id, params, result, rendered
+        
+        with open(data_tmp, 'wb') as f:
+            def write(raw):
+                offset = f.tell()
+                f.write(raw)
+                f.write(b'\0' * (-f.tell() % _BLOB_ALIGN))
+                return offset
+            
+            # 结果逐条写入数据文件，内存中不保留全部结果
+            with ThreadPoolExecutor(max(1, workers)) as executor:
+                for done, (experiment_id, params, result, rendered) in enumerate(executor.map(evaluate, tasks), 1):
+                    if 'error' in result:
+                        raise RuntimeError(f"实验{experiment_id} {params}: {result['error']}")
+                    seen = {}
+                    results[_precompute_key(experiment_id, params)] = _pack(result, write, seen)
+                    for (method, kind), images in rendered.items():
+                        figures[_precompute_key(experiment_id, params, method, kind)] = _pack(images, write, seen)
+                    _report(progress, done / len(tasks), f"实验{experiment_id} {params}")
+        
+        faces = self.simulation_data['faces']
+        index_tmp = os.path.join(store_dir, 'index.tmp.json')
+        with open(index_tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': PRECOMPUTE_VERSION,
+                'fingerprint': self.dataset_fingerprint(),
+                'meta': {
+                    'shape': list(faces['shape']),
+                    'count': int(faces['count']),
+                    'format': fmt,
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+                },
+                'results': results,
+                'figures': figures
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        # 先替换数据文件再替换索引，索引存在时数据一定完整
+        os.replace(data_tmp, os.path.join(store_dir, 'data.bin'))
+        os.replace(index_tmp, os.path.join(store_dir, 'index.json'))
+        return len(tasks)
+    
+    def load_precomputed(self, store_dir):
+        """加载预计算缓存；目录不存在或与当前数据集不符时返回 False
+
+        缓存只对加载时的数据集版本有效，登记新人脸后自动失效。
+        """
+        if not os.path.exists(os.path.join(store_dir, 'index.json')):
+            return False
+        store = PrecomputedStore(store_dir)
+        if store.fingerprint != self.dataset_fingerprint():
+            return False
+        self._precomputed = (store, self.dataset_version)
+        return True
+    
+    def _precomputed_store(self, key):
+        precomputed = self._precomputed
+        if precomputed is None or not (isinstance(key, tuple) and len(key) == 3 and key[2] == precomputed[1]):
+            return None
+        return precomputed[0]
+    
+    def cache_info(self):
+        """返回结果缓存、图像缓存和流水线各节点的命中统计"""
+        return {
+            'results': self._result_cache.info(),
+            'figures': self._figure_cache.info(),
+            'pipeline': self.pipeline.info()
+        }
+    
+    def clear_cache(self):
+        """清空结果缓存、图像缓存和流水线中的中间结果"""
+        self._result_cache.clear()
+        self._figure_cache.clear()
+        self.pipeline.clear()
+    
+    def _cache_key(self, experiment_id, params):
+        return (experiment_id, tuple(sorted(params.items())), self.dataset_version)
+    
+    @staticmethod
+    def _normalize_params(experiment_id, params):
+        """只保留实验用到的参数，补全默认值并转换为 Python 基本类型"""
+        params = params or {}
+        normalized = {}
+        for name, default in EXPERIMENT_PARAMS.get(experiment_id, {}).items():
+            value = params.get(name, default)
+            value = value.item() if isinstance(value, np.generic) else value
+            # 滑块的浮点取值可能带有舍入误差（如 0.30000000000000004），统一后才能命中缓存
+            normalized[name] = round(value, 6) if isinstance(value, float) else value
+        return normalized
+    
+    def _run_experiment(self, experiment_id, params, progress=None):
+        """按编号分派实验（需要拟合模型的实验会报告进度）"""
+        if experiment_id == 1:
+            return self._exp1_image_to_vector()
+        elif experiment_id == 2:
+            return self._exp2_mean_face(params)
+        elif experiment_id == 3:
+            return self._exp3_centering(params)
+        elif experiment_id == 4:
+            return self._exp4_covariance_matrix(params)
+        elif experiment_id == 5:
+            return self._exp5_eigen_decomposition(params)
+        elif experiment_id == 6:
+            return self._exp6_eigenfaces(params, progress)
+        elif experiment_id == 7:
+            return self._exp7_projection(params, progress)
+        elif experiment_id == 8:
+            return self._exp8_reconstruction(params, progress)
+        elif experiment_id == 9:
+            return self._exp9_face_recognition(params, progress)
+        elif experiment_id == 10:
+            return self._exp10_complete_system(params, progress)
+        
+        return {"error": "实验不存在"}
+    
+    def _exp1_image_to_vector(self):
+        """实验1：图像到向量的转换"""
+        faces = self.simulation_data['faces']
+        img_data = np.asarray(faces['data'][0]).reshape(faces['shape'])
+        
+        result = {
+            'title': '图像矩阵表示',
+            'description': '学习如何将图像表示为矩阵和向量',
+            'steps': [
+                '1. 图像由像素矩阵组成',
+                '2. 矩阵可以展平为向量',
+                '3. 人脸图像 → 高维向量'
+            ],
+            'viz_spec': ('_viz_image_to_vector', (img_data,)),
+            'interactive': True,
+            'formula': r'''
+            \begin{aligned}
+            &\text{图像矩阵: } I \in \mathbb{R}^{m \times n} \\
+            &\text{向量化: } \vec{x} = \text{flatten}(I) \in \mathbb{R}^{mn}
+            \end{aligned}
+            '''
+        }
+        return result
+    
+    def _exp2_mean_face(self, params):
+        """实验2：计算平均脸"""
+        n_samples = params.get('n_samples', 5)
+        
+        # 前n_samples个人脸及其平均脸（与实验3共享流水线中的节点）
+        faces = self.pipeline.get('data', {'n_samples': n_samples})
+        mean_face = self.pipeline.get('mean', {'n_samples': n_samples})
+        
+        result = {
+            'title': '平均脸计算',
+            'description': '计算多个入脸的平均特征',
+            'mean_face': mean_face,
+            'n_samples': n_samples,
+            'viz_spec': ('_viz_mean_face', (faces, mean_face, self.simulation_data['faces']['shape'])),
+            'formula': r'''
+            \mu = \frac{1}{N} \sum_{i=1}^{N} \vec{x}_i
+            '''
+        }
+        return result
+    
+    def _pixel_columns(self, params, count):
+        """方差最大的 count 个像素：返回 (像素下标, 原始值 (n, count), 中心化值 (n, count))
+
+        高维人脸无法直接画散点图，取变化最大的几个像素作为坐标轴。
+        """
+        data = self.pipeline.get('data', params)
+        centered = self.pipeline.get('centered', params)
+        variance = np.zeros(centered.shape[1])
+        for _, chunk in centered.chunks():
+            variance += np.einsum('ij,ij->j', chunk, chunk, dtype=np.float64)
+        pixels = np.sort(np.argsort(variance)[::-1][:count])
+        columns = np.concatenate([chunk[:, pixels] for _, chunk in centered.chunks()])
+        return pixels, np.asarray(data[:, pixels]), columns
+    
+    def _exp3_centering(self, params):
+        """实验3：数据中心化"""
+        # 前 n_samples 张人脸上方差最大的3个像素
+        pixels, original_data, centered_data = self._pixel_columns(params, 3)
+        mean_vector = self.pipeline.get('mean', params)[pixels]
+        
+        result = {
+            'title': '数据中心化',
+            'description': '将数据移到原点，便于分析',
+            'original_data': original_data,
+            'centered_data': centered_data,
+            'mean': mean_vector,
+            'pixels': pixels,
+            'viz_spec': ('_viz_centering', (original_data, centered_data, mean_vector)),
+            'formula': r'''
+            \vec{x}_i' = \vec{x}_i - \mu
+            '''
+        }
+        return result
+    
+    def _exp4_covariance_matrix(self, params):
+        """实验4：协方差矩阵"""
+        # 方差最大的两个像素，以及它们在二阶矩矩阵中对应的 2×2 子块
+        pixels, data, centered = self._pixel_columns(params, 2)
+        moment, method = self.pipeline.get('moment', params)
+        if method == 'covariance':
+            cov_matrix = moment[np.ix_(pixels, pixels)]
+        else:
+            # Gram 矩阵（N×N）中没有像素之间的协方差，直接由中心化的两列计算
+            cov_matrix = centered.T.astype(np.float64) @ centered / (len(centered) - 1)
+        
+        result = {
+            'title': '协方差矩阵',
+            'description': '描述数据维度之间的相关性',
+            'covariance_matrix': cov_matrix,
+            'data': data,
+            'pixels': pixels,
+            'moment_method': method,
+            'moment_shape': moment.shape,
+            'viz_spec': ('_viz_covariance', (data, cov_matrix)),
+            'formula': r'''
+            C = \frac{1}{n-1} \sum_{i=1}^{n} (\vec{x}_i - \mu)(\vec{x}_i - \mu)^T
+            '''
+        }
+        return result
+    
+    def _exp5_eigen_decomposition(self, params):
+        """实验5：特征值分解"""
+        # 创建一个对称矩阵
+        A = np.array([[2, 1], [1, 2]])
+        
+        # 计算特征值和特征向量
+        eigenvalues, eigenvectors = np.linalg.eig(A)
+        
+        result = {
+            'title': '特征值分解',
+            'description': '将矩阵分解为特征向量和特征值',
+            'matrix': A,
+            'eigenvalues': eigenvalues,
+            'eigenvectors': eigenvectors,
+            'viz_spec': ('_viz_eigen_decomposition', (A, eigenvalues, eigenvectors)),
+            'formula': r'''
+            A\vec{v}_i = \lambda_i \vec{v}_i
+            '''
+        }
+        return result
+    
+    def _exp6_eigenfaces(self, params, progress=None):
+        """实验6：特征脸提取"""
+        n_eigenfaces = params.get('n_eigenfaces', 5)
+        
+        # 从人脸数据中计算特征脸（只需要前 n_eigenfaces 个）
+        model = self.get_eigen_model(progress, n_eigenfaces, params.get('solver', 'auto'))
+        n_eigenfaces = min(n_eigenfaces, model.n_components)
+        eigenfaces = model.components[:, :n_eigenfaces]
+        eigenvalues = model.eigenvalues[:n_eigenfaces]
+        
+        result = {
+            'title': '特征脸提取',
+            'description': '从人脸数据中提取主成分方向',
+            'eigenfaces': eigenfaces,
+            'eigenvalues': eigenvalues,
+            'n_eigenfaces': n_eigenfaces,
+            'explained_variance_ratio': eigenvalues.sum() / model.total_variance,
+            'decomposition': model.method,
+            **self._solver_info(model, n_eigenfaces),
+            'viz_spec': ('_viz_eigenfaces', (eigenfaces, eigenvalues, self.simulation_data['faces']['shape'])),
+            'formula': r'''
+            C\vec{v}_i = \lambda_i \vec{v}_i \quad \text{(特征脸)}
+            '''
+        }
+        return result
+    
+    def _exp7_projection(self, params, progress=None):
+        """实验7：投影到特征脸空间"""
+        n_components = params.get('n_components', 3)
+        model_params = self._model_params(n_components, params.get('solver', 'auto'))
+        model = self.pipeline.get('eigen', model_params, progress)
+        
+        # 原始人脸（高维）
+        original_face = self.simulation_data['faces']['data'][0]
+        
+        # 特征脸空间（低维）
+        n_components = min(n_components, model.n_components)
+        eigenfaces = model.components[:, :n_components]
+        
+        # 投影（流水线中全部人脸的投影坐标，取第一张的前 k 个）
+        projection_coords = self.pipeline.get('projection', model_params)[0, :n_components]
+        
+        result = {
+            'title': '高维到低维投影',
+            'description': '将人脸投影到特征脸空间',
+            'original_dim': len(original_face),
+            'projected_dim': n_components,
+            'projection_coords': projection_coords,
+            'compression_ratio': n_components / len(original_face) * 100,
+            **self._solver_info(model, n_components),
+            'viz_spec': ('_viz_projection', (original_face, eigenfaces, projection_coords)),
+            'formula': r'''
+            \vec{y} = V_k^T (\vec{x} - \mu)
+            '''
+        }
+        return result
+    
+    def _exp8_reconstruction(self, params, progress=None):
+        """实验8：人脸重建"""
+        n_components = params.get('n_components', 20)
+        # 误差曲线和对比图最多用到 80 个特征脸
+        model_params = self._model_params(max(80, n_components), params.get('solver', 'auto'))
+        model = self.pipeline.get('eigen', model_params, progress)
+        
+        # 原始人脸
+        original_face = self.simulation_data['faces']['data'][0]
+        
+        # 所有 k 的误差曲线：当前人脸和整个数据集的平均，各只需一次投影
+        error_curve = model.reconstruction_errors(original_face)
+        dataset_error_curve = self.pipeline.get('reconstruction_error', model_params)
+        
+        # 展示几种特征脸数量下的重建结果（包含当前选择的数量）
+        components_list = sorted({min(k, model.n_components)
+                                  for k in [1, 5, 10, 20, 40, 80, n_components]})
+        # 各 k 的截断坐标排成一批（第 j 行只保留前 k_j 个坐标），一次矩阵乘法完成全部重建
+        coords = self.pipeline.get('projection', model_params)[0, :max(components_list)]
+        truncated = coords * (np.arange(len(coords)) < np.array(components_list)[:, None])
+        reconstructed_faces = list(model.reconstruct(truncated))
+        reconstruction_errors = [float(error_curve[k]) for k in components_list]
+        
+        result = {
+            'title': '人脸重建',
+            'description': '使用特征脸重建原始人脸',
+            'reconstruction_errors': reconstruction_errors,
+            'reconstructed_faces': reconstructed_faces,
+            'original_face': original_face,
+            'n_components_list': components_list,
+            'error_curve': error_curve,
+            'dataset_error_curve': dataset_error_curve,
+            **self._solver_info(model, max(components_list)),
+            'viz_spec': ('_viz_reconstruction', (original_face, reconstructed_faces,
+                                                 reconstruction_errors, components_list,
+                                                 self.simulation_data['faces']['shape'],
+                                                 error_curve, dataset_error_curve)),
+            'formula': r'''
+            \hat{\vec{x}} = \mu + \sum_{i=1}^{k} y_i \vec{v}_i
+            '''
+        }
+        return result
+    
+    @staticmethod
+    def _train_mask(labels, n_train_per_person=8):
+        """每人前 n_train_per_person 张为训练集（True），其余为测试集"""
+        return _rank_within_label(labels) < n_train_per_person
+    
+    def _exp9_face_recognition(self, params, progress=None):
+        """实验9：人脸识别"""
+        n_components = params.get('n_components', 10)
+        model_params = self._model_params(n_components, params.get('solver', 'auto'))
+        # 每人前8张作为训练集，其余作为测试集；特征脸只在训练集上拟合
+        model = self.pipeline.get('train_eigen', model_params, progress)
+        faces = self.simulation_data['faces']
+        train_mask = self._train_mask(faces['labels'])
+        
+        # 投影到训练集的特征脸空间（流水线中的坐标取前 k 列）
+        train_coords, test_coords = self.pipeline.get('train_projection', model_params)
+        train_features = train_coords[:, :n_components]
+        train_labels = faces['labels'][train_mask]
+        test_features = test_coords[:, :n_components]
+        test_labels = faces['labels'][~train_mask]
+        
+        # 最近邻识别（一次批量检索所有测试样本）
+        index = build_gallery_index(train_features, params.get('index', 'brute'))
+        nearest_indices, nearest_distances = index.search(test_features, k=1)
+        nearest_indices = nearest_indices[:, 0]
+        predictions = train_labels[nearest_indices]
+        
+        # 计算准确率
+        accuracy = np.mean(predictions == test_labels) * 100
+        
+        result = {
+            'title': '人脸识别',
+            'description': '在特征脸空间中进行最近邻分类',
+            'accuracy': accuracy,
+            'n_correct': np.sum(predictions == test_labels),
+            'n_total': len(test_labels),
+            'n_components': train_features.shape[1],
+            'train_features': train_features,
+            'test_features': test_features,
+            'train_labels': train_labels,
+            'test_labels': test_labels,
+            'predictions': predictions,
+            'nearest_indices': nearest_indices,
+            'nearest_distances': nearest_distances[:, 0],
+            'index': index.name,
+            **self._solver_info(model, n_components, 'train_eigen'),
+            'viz_spec': ('_viz_face_recognition', (train_features, test_features, train_labels, test_labels,
+                                                   predictions, nearest_indices)),
+            'formula': r'''
+            \text{识别} = \arg\min_j \|\vec{y}_{\text{test}} - \vec{y}_j\|
+            '''
+        }
+        return result
+    
+    def _exp10_complete_system(self, params, progress=None):
+        """实验10：完整系统演示（在当前数据集上实际运行并计时）"""
+        faces = self.simulation_data['faces']
+        shape = faces['shape']
+        train_mask = self._train_mask(faces['labels'])
+        # 用下标视图按块读取，内存映射的大数据集不会被布尔索引整体复制到内存
+        train_data = FaceRows(faces['data'], np.flatnonzero(train_mask))
+        test_data = FaceRows(faces['data'], np.flatnonzero(~train_mask))
+        train_labels = faces['labels'][train_mask]
+        test_labels = faces['labels'][~train_mask]
+        
+        # 训练：PCA 降维 + 特征提取（建立人脸库），只执行一次
+        start = time.perf_counter()
+        model = EigenfaceModel(self.dtype).fit(train_data, progress=_sub_progress(progress, 0.0, 0.5),
+                                               n_components=params.get('n_components', 50),
+                                               solver=params.get('solver', 'auto'))
+        fit_s = time.perf_counter() - start
+        n_components = min(params.get('n_components', 50), model.n_components)
+        start = time.perf_counter()
+        gallery = model.project(train_data, n_components)
+        gallery_sq_norms = np.einsum('ij,ij->i', gallery, gallery)
+        gallery_s = time.perf_counter() - start
+        
+        # 在线识别：逐张人脸记录每个阶段的耗时
+        stages = ['preprocess', 'vectorize', 'center', 'project', 'distance', 'classify']
+        timings = {stage: np.empty(len(test_data)) for stage in stages}
+        predictions = np.empty(len(test_data), dtype=test_labels.dtype)
+        components = model.components[:, :n_components]
+        _report(progress, 0.5, "逐张识别测试人脸...")
+        for i in range(len(test_data)):
+            image = test_data[i].reshape(shape)
+            t0 = time.perf_counter()
+            image_range = image.max() - image.min()
+            image = (image - image.min()) / image_range if image_range > 0 else image
+            t1 = time.perf_counter()
+            x = image.reshape(-1)
+            t2 = time.perf_counter()
+            x = x - model.mean
+            t3 = time.perf_counter()
+            y = x @ components
+            t4 = time.perf_counter()
+            sq_dist = gallery_sq_norms - 2 * (gallery @ y)
+            t5 = time.perf_counter()
+            predictions[i] = train_labels[np.argmin(sq_dist)]
+            t6 = time.perf_counter()
+            for stage, (begin, end) in zip(stages, [(t0, t1), (t1, t2), (t2, t3), (t3, t4), (t4, t5), (t5, t6)]):
+                timings[stage][i] = end - begin
+        
+        stage_latency = {
+            stage: {
+                'p50_ms': float(np.percentile(values, 50)) * 1000,
+                'p95_ms': float(np.percentile(values, 95)) * 1000
+            }
+            for stage, values in timings.items()
+        }
+        stage_latency['fit'] = {'total_ms': fit_s * 1000}
+        stage_latency['gallery'] = {'total_ms': gallery_s * 1000}
+        per_face = np.sum([values for values in timings.values()], axis=0)
+        
+        # 批量识别吞吐量
+        _report(progress, 0.9, "测量批量吞吐量...")
+        start = time.perf_counter()
+        batch_coords = model.project(test_data, n_components)
+        batch_nearest = knn_search(batch_coords, gallery, k=1, gallery_sq_norms=gallery_sq_norms)[0][:, 0]
+        batch_s = time.perf_counter() - start
+        
+        accuracy = float(np.mean(predictions == test_labels)) * 100
+        n_features = train_data.shape[1]
+        model_bytes = model.mean.nbytes + components.nbytes + model.eigenvalues[:n_components].nbytes
+        gallery_bytes = gallery.nbytes + train_labels.nbytes
+        
+        result = {
+            'title': '完整人脸识别系统',
+            'description': '从图像输入到识别结果的完整流程',
+            'steps': [
+                '1. 图像采集 → 2. 预处理 → 3. 向量化',
+                '4. 中心化 → 5. PCA降维 → 6. 特征提取',
+                '7. 投影 → 8. 距离计算 → 9. 分类识别'
+            ],
+            'performance_metrics': {
+                'accuracy': f'{accuracy:.1f}%',
+                'processing_time': f'{np.percentile(per_face, 50) * 1000:.3f} ms',
+                'throughput': f'{len(test_data) / batch_s:,.0f} 张/秒',
+                'compression_ratio': f'{n_components / n_features * 100:.2f}%',
+                'dimension_reduction': f'{n_features} → {n_components}',
+                'memory': f'{(model_bytes + gallery_bytes) / 1e6:.2f} MB'
+            },
+            'stage_latency': stage_latency,
+            'memory_footprint': {'model_bytes': model_bytes, 'gallery_bytes': gallery_bytes},
+            'solver': model.solver,
+            'accuracy': accuracy,
+            'batch_accuracy': float(np.mean(train_labels[batch_nearest] == test_labels)) * 100,
+            'viz_spec': ('_viz_complete_system', (stage_latency, {
+                'accuracy': accuracy,
+                'per_face_p50_ms': float(np.percentile(per_face, 50)) * 1000,
+                'per_face_p95_ms': float(np.percentile(per_face, 95)) * 1000,
+                'throughput': len(test_data) / batch_s,
+                'n_features': n_features,
+                'n_components': n_components,
+                'n_train': len(train_data),
+                'n_test': len(test_labels),
+                'memory_mb': (model_bytes + gallery_bytes) / 1e6
+            })),
+            'formula': r'''
+            \begin{aligned}
+            &\text{输入: } I \rightarrow \vec{x} \rightarrow \vec{x}' = \vec{x} - \mu \\
+            &\text{投影: } \vec{y} = V_k^T \vec{x}' \\
+            &\text{识别: } \text{ID} = \arg\min_j \|\vec{y} - \vec{y}_j\|
+            \end{aligned}
+            '''
+        }
+        return result
+    
+    # ============================================================================
+    # 可视化方法
+    # ============================================================================
+    
+    def _viz_image_to_vector(self, img_data):
+        """可视化：图像到向量转换"""
+        plt = _pyplot()
+        fig, axes = plt.subplots(2, 2, figsize=(10, 8))
+        height, width = img_data.shape
+        
+        # 1. 原始图像
+        axes[0, 0].imshow(img_data, cmap='gray', aspect='auto')
+        axes[0, 0].set_title(f'原始图像 ({height}×{width} 像素)')
+        axes[0, 0].grid(True, alpha=0.3)
+        
+        # 2. 像素值矩阵
+        axes[0, 1].imshow(img_data, cmap='hot', aspect='auto')
+        axes[0, 1].set_title('像素值矩阵')
+        
+        # 添加像素值文本（只在小图上标注，大图标注会难以辨认且很慢）
+        if height * width <= 100:
+            for i in range(height):
+                for j in range(width):
+                    axes[0, 1].text(j, i, f'{img_data[i, j]:.2f}', 
+                                   ha='center', va='center', 
+                                   color='white' if img_data[i, j] < 0.5 else 'black',
+                                   fontsize=8)
+        
+        # 3. 展平为向量
+        vector = img_data.flatten()
+        axes[1, 0].plot(vector, 'b-', linewidth=2)
+        axes[1, 0].fill_between(range(len(vector)), 0, vector, alpha=0.3)
+        axes[1, 0].set_title(f'展平为向量 ({len(vector)} 维)')
+        axes[1, 0].set_xlabel('向量索引')
+        axes[1, 0].set_ylabel('像素值')
+        axes[1, 0].grid(True, alpha=0.3)
+        
+        # 4. 向量表示
+        axes[1, 1].axis('off')
+        axes[1, 1].text(0.5, 0.5, 
+                       f'向量表示:\n[{vector[0]:.2f}, {vector[1]:.2f}, ..., {vector[-1]:.2f}]',
+                       ha='center', va='center', fontsize=12,
+                       bbox=dict(boxstyle="round,pad=0.3", facecolor="lightblue"))
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_mean_face(self, faces, mean_face, shape):
+        """可视化：平均脸计算"""
+        plt = _pyplot()
+        n_samples = len(faces)
+        
+        fig, axes = plt.subplots(2, min(n_samples, 3) + 1, figsize=(15, 8))
+        
+        # 显示原始人脸
+        for i in range(min(n_samples, 3)):
+            face_img = faces[i].reshape(shape)
+            axes[0, i].imshow(face_img, cmap='gray', aspect='auto')
+            axes[0, i].set_title(f'人脸 {i+1}')
+            axes[0, i].axis('off')
+        
+        # 如果有更多样本，显示"..." 
+        if n_samples > 3:
+            axes[0, 3].axis('off')
+            axes[0, 3].text(0.5, 0.5, f'+ {n_samples-3} 更多', 
+                           ha='center', va='center', fontsize=14)
+        
+        # 显示平均过程
+        axes[1, 0].axis('off')
+        axes[1, 0].text(0.5, 0.7, '求平均', ha='center', va='center', fontsize=16)
+        axes[1, 0].text(0.5, 0.3, f'({n_samples} 张人脸)', ha='center', va='center')
+        
+        # 显示平均脸
+        mean_img = mean_face.reshape(shape)
+        axes[1, 1].imshow(mean_img, cmap='gray', aspect='auto')
+        axes[1, 1].set_title('平均脸')
+        axes[1, 1].axis('off')
+        
+        # 显示平均脸向量
+        axes[1, 2].plot(mean_face, 'r-', linewidth=2)
+        axes[1, 2].fill_between(range(len(mean_face)), 0, mean_face, alpha=0.3, color='red')
+        axes[1, 2].set_title('平均脸向量')
+        axes[1, 2].set_xlabel('维度')
+        axes[1, 2].set_ylabel('平均值')
+        axes[1, 2].grid(True, alpha=0.3)
+        
+        # 隐藏多余的子图
+        for i in range(3, axes.shape[1]):
+            axes[1, i].axis('off')
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_centering(self, original_data, centered_data, mean_vector):
+        """可视化：数据中心化"""
+        plt = _pyplot()
+        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        
+        # 1. 原始数据
+        axes[0].scatter(original_data[:, 0], original_data[:, 1], alpha=0.6)
+        axes[0].scatter(mean_vector[0], mean_vector[1], color='red', s=200, marker='*', label='均值')
+        axes[0].set_title('原始数据 (有偏移)')
+        axes[0].set_xlabel('特征1')
+        axes[0].set_ylabel('特征2')
+        axes[0].grid(True, alpha=0.3)
+        axes[0].legend()
+        
+        # 2. 减去均值
+        axes[1].scatter(original_data[:, 0], original_data[:, 1], alpha=0.3, label='原始')
+        axes[1].scatter(centered_data[:, 0], centered_data[:, 1], alpha=0.6, label='中心化后')
+        
+        # 绘制从原始点到中心化点的箭头（箭头大小随数据范围缩放，像素值只在 0-1 之间）
+        head = 0.02 * np.ptp(np.vstack([original_data[:, :2], centered_data[:, :2]]))
+        for i in range(min(10, len(original_data))):
+            axes[1].arrow(original_data[i, 0], original_data[i, 1],
+                         centered_data[i, 0] - original_data[i, 0],
+                         centered_data[i, 1] - original_data[i, 1],
+                         head_width=head, head_length=head, fc='gray', ec='gray', alpha=0.5)
+        
+        axes[1].set_title('减去均值的过程')
+        axes[1].set_xlabel('特征1')
+        axes[1].set_ylabel('特征2')
+        axes[1].grid(True, alpha=0.3)
+        axes[1].legend()
+        
+        # 3. 中心化后的数据
+        axes[2].scatter(centered_data[:, 0], centered_data[:, 1], alpha=0.6)
+        axes[2].scatter(0, 0, color='red', s=200, marker='*', label='新原点')
+        axes[2].set_title('中心化数据 (均值为0)')
+        axes[2].set_xlabel('特征1')
+        axes[2].set_ylabel('特征2')
+        axes[2].grid(True, alpha=0.3)
+        axes[2].legend()
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_covariance(self, data, cov_matrix):
+        """可视化：协方差矩阵"""
+        plt = _pyplot()
+        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        
+        # 1. 原始数据散点图
+        axes[0].scatter(data[:, 0], data[:, 1], alpha=0.6)
+        axes[0].set_xlabel('特征 X')
+        axes[0].set_ylabel('特征 Y')
+        axes[0].set_title('二维数据分布')
+        axes[0].grid(True, alpha=0.3)
+        
+        # 添加均值线
+        mean_x, mean_y = np.mean(data, axis=0)
+        axes[0].axhline(y=mean_y, color='r', linestyle='--', alpha=0.5)
+        axes[0].axvline(x=mean_x, color='r', linestyle='--', alpha=0.5)
+        
+        # 2. 协方差矩阵热图
+        im = axes[1].imshow(cov_matrix, cmap='coolwarm', aspect='auto')
+        axes[1].set_title('协方差矩阵')
+        axes[1].set_xticks([0, 1])
+        axes[1].set_xticklabels(['特征X', '特征Y'])
+        axes[1].set_yticks([0, 1])
+        axes[1].set_yticklabels(['特征X', '特征Y'])
+        
+        # 在热图中显示数值
+        for i in range(2):
+            for j in range(2):
+                text = axes[1].text(j, i, f'{cov_matrix[i, j]:.2f}',
+                                  ha="center", va="center", color="black")
+        
+        # 3. 协方差解释
+        axes[2].axis('off')
+        
+        cov_text = f"""
+        协方差矩阵:
+        
+        C = [{cov_matrix[0,0]:.2f}, {cov_matrix[0,1]:.2f};
+             {cov_matrix[1,0]:.2f}, {cov_matrix[1,1]:.2f}]
+        
+        对角线元素:
+        • C[0,0] = {cov_matrix[0,0]:.2f} (特征X的方差)
+        • C[1,1] = {cov_matrix[1,1]:.2f} (特征Y的方差)
+        
+        非对角线元素:
+        • C[0,1] = C[1,0] = {cov_matrix[0,1]:.2f}
+        • 正值表示正相关
+        • 负值表示负相关
+        • 零表示不相关
+        """
+        
+        axes[2].text(0.1, 0.5, cov_text, ha='left', va='center', fontsize=12,
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="lightyellow"))
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_eigen_decomposition(self, A, eigenvalues, eigenvectors):
+        """可视化：特征值分解"""
+        plt = _pyplot()
+        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        
+        # 1. 原始矩阵的变换效果
+        # 创建单位圆上的点
+        theta = np.linspace(0, 2*np.pi, 100)
+        circle_x = np.cos(theta)
+        circle_y = np.sin(theta)
+        circle_points = np.vstack([circle_x, circle_y]).T
+        
+        # 应用矩阵变换
+        transformed_points = circle_points @ A.T
+        
+        axes[0].plot(circle_x, circle_y, 'b-', alpha=0.5, label='单位圆')
+        axes[0].plot(transformed_points[:, 0], transformed_points[:, 1], 'r-', label='变换后的椭圆')
+        axes[0].set_xlabel('X')
+        axes[0].set_ylabel('Y')
+        axes[0].set_title('矩阵变换效果')
+        axes[0].grid(True, alpha=0.3)
+        axes[0].legend()
+        axes[0].axis('equal')
+        
+        # 2. 特征向量方向
+        axes[1].plot(circle_x, circle_y, 'b-', alpha=0.3)
+        axes[1].plot(transformed_points[:, 0], transformed_points[:, 1], 'r-', alpha=0.3)
+        
+        # 绘制特征向量
+        origin = np.array([0, 0])
+        colors = ['red', 'green']
+        
+        for i in range(2):
+            vec = eigenvectors[:, i] * eigenvalues[i]
+            axes[1].arrow(origin[0], origin[1], vec[0], vec[1], 
+                         head_width=0.1, head_length=0.1, 
+                         fc=colors[i], ec=colors[i], 
+                         label=f'特征向量 {i+1} (λ={eigenvalues[i]:.2f})')
+        
+        axes[1].set_xlabel('X')
+        axes[1].set_ylabel('Y')
+        axes[1].set_title('特征向量方向')
+        axes[1].grid(True, alpha=0.3)
+        axes[1].legend()
+        axes[1].axis('equal')
+        
+        # 3. 特征值分解解释
+        axes[2].axis('off')
+        
+        eigen_text = f"""
+        矩阵 A:
+        [{A[0,0]}, {A[0,1]}]
+        [{A[1,0]}, {A[1,1]}]
+        
+        特征值分解:
+        A·v₁ = λ₁·v₁
+        A·v₂ = λ₂·v₂
+        
+        特征值:
+        • λ₁ = {eigenvalues[0]:.2f}
+        • λ₂ = {eigenvalues[1]:.2f}
+        
+        特征向量:
+        • v₁ = [{eigenvectors[0,0]:.2f}, {eigenvectors[1,0]:.2f}]ᵀ
+        • v₂ = [{eigenvectors[0,1]:.2f}, {eigenvectors[1,1]:.2f}]ᵀ
+        """
+        
+        axes[2].text(0.1, 0.5, eigen_text, ha='left', va='center', fontsize=12,
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="lightgreen"))
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_eigenfaces(self, eigenfaces, eigenvalues, shape):
+        """可视化：特征脸"""
+        plt = _pyplot()
+        n_eigenfaces = eigenfaces.shape[1]
+        n_cols = min(5, n_eigenfaces)
+        n_rows = (n_eigenfaces + n_cols - 1) // n_cols
+        
+        fig = plt.figure(figsize=(15, 3 * n_rows))
+        
+        # 显示特征脸
+        for i in range(n_eigenfaces):
+            ax = plt.subplot(n_rows, n_cols, i + 1)
+            eigenface_img = eigenfaces[:, i].reshape(shape)
+            ax.imshow(eigenface_img, cmap='gray', aspect='auto')
+            ax.set_title(f'特征脸 {i+1}\nλ={eigenvalues[i]:.2f}')
+            ax.axis('off')
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_projection(self, original_face, eigenfaces, projection_coords):
+        """可视化：高维到低维投影"""
+        plt = _pyplot()
+        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        
+        # 1. 原始高维空间
+        axes[0].plot(original_face, 'b-', linewidth=2)
+        axes[0].fill_between(range(len(original_face)), 0, original_face, alpha=0.3)
+        axes[0].set_xlabel(f'维度 ({len(original_face)}维)')
+        axes[0].set_ylabel('像素值')
+        axes[0].set_title('原始人脸 (高维空间)')
+        axes[0].grid(True, alpha=0.3)
+        
+        # 2. 投影过程
+        axes[1].axis('off')
+        
+        # 绘制从高维到低维的箭头
+        axes[1].text(0.5, 0.7, f'高维空间\n({len(original_face)}维)', ha='center', va='center', 
+                    fontsize=14, bbox=dict(boxstyle="round,pad=0.3", facecolor="lightblue"))
+        
+        # 箭头
+        axes[1].arrow(0.5, 0.6, 0, -0.3, head_width=0.05, head_length=0.05, 
+                     fc='gray', ec='gray', width=0.01)
+        
+        axes[1].text(0.5, 0.3, '投影', ha='center', va='center', fontsize=12)
+        
+        axes[1].arrow(0.5, 0.25, 0, -0.3, head_width=0.05, head_length=0.05, 
+                     fc='gray', ec='gray', width=0.01)
+        
+        axes[1].text(0.5, 0.1, f'低维空间\n({len(projection_coords)}维)', 
+                    ha='center', va='center', fontsize=14,
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="lightgreen"))
+        
+        # 3. 投影后的低维坐标
+        if len(projection_coords) == 3:
+            # 3D散点图
+            from mpl_toolkits.mplot3d import Axes3D
+            ax3d = fig.add_subplot(133, projection='3d')
+            ax3d.scatter(projection_coords[0], projection_coords[1], projection_coords[2], 
+                        s=100, c='red', marker='o')
+            ax3d.set_xlabel('特征脸1')
+            ax3d.set_ylabel('特征脸2')
+            ax3d.set_zlabel('特征脸3')
+            ax3d.set_title('投影坐标 (3D空间)')
+        else:
+            # 2D或1D显示
+            axes[2].bar(range(len(projection_coords)), projection_coords)
+            axes[2].set_xlabel('特征脸维度')
+            axes[2].set_ylabel('投影坐标')
+            axes[2].set_title(f'投影坐标 ({len(projection_coords)}维)')
+            axes[2].grid(True, alpha=0.3)
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_reconstruction(self, original_face, reconstructed_faces, reconstruction_errors, components_list,
+                            shape, error_curve, dataset_error_curve):
+        """可视化：人脸重建（重建结果和误差曲线两张图）"""
+        plt = _pyplot()
+        fig = self._viz_reconstruction_faces(original_face, reconstructed_faces, reconstruction_errors,
+                                             components_list, shape, error_curve, dataset_error_curve)
+        
+        # 添加第二个图：误差曲线（k = 1..r 全部取值）
+        fig2, ax = plt.subplots(figsize=(10, 5))
+        
+        ks = np.arange(1, len(error_curve))
+        ax.plot(ks, error_curve[1:], 'r-', linewidth=2, label='当前人脸')
+        ax.plot(ks, dataset_error_curve[1:], 'b--', linewidth=1.5, label='数据集平均')
+        ax.plot(components_list, reconstruction_errors, 'ro', markersize=8)
+        ax.legend()
+        ax.set_xlabel('特征脸数量')
+        ax.set_ylabel('重建误差 (MSE)')
+        ax.set_title('重建误差 vs 特征脸数量')
+        ax.grid(True, alpha=0.3)
+        ax.set_xscale('log')
+        
+        # 标记关键点
+        for i, (comp, err) in enumerate(zip(components_list, reconstruction_errors)):
+            ax.annotate(f'{comp}个\n{err:.4f}', 
+                       (comp, err), 
+                       textcoords="offset points", 
+                       xytext=(0,10), 
+                       ha='center')
+        
+        return fig, fig2
+    
+    def _viz_reconstruction_faces(self, original_face, reconstructed_faces, reconstruction_errors,
+                                  components_list, shape, error_curve=None, dataset_error_curve=None):
+        """可视化：各特征脸数量下的重建人脸及误差"""
+        plt = _pyplot()
+        n_reconstructions = len(reconstructed_faces)
+        
+        fig, axes = plt.subplots(2, n_reconstructions, figsize=(4*n_reconstructions, 8),
+                                 squeeze=False)
+        
+        for i in range(n_reconstructions):
+            # 显示重建人脸
+            recon_img = reconstructed_faces[i].reshape(shape)
+            axes[0, i].imshow(recon_img, cmap='gray', aspect='auto')
+            axes[0, i].set_title(f'{components_list[i]}个特征脸\nMSE={reconstruction_errors[i]:.4f}')
+            axes[0, i].axis('off')
+            
+            # 显示重建误差
+            if i < len(reconstruction_errors):
+                axes[1, i].bar(['误差'], [reconstruction_errors[i]])
+                axes[1, i].set_ylim(0, max(reconstruction_errors) * 1.1)
+                axes[1, i].set_title('重建误差')
+        
+        plt.tight_layout()
+        return fig
+    
+    def _viz_face_recognition(self, train_features, test_features, train_labels, test_labels, predictions,
+                              nearest_indices):
+        """可视化：人脸识别"""
+        plt = _pyplot()
+        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        
+        # 1. 特征脸空间中的点（只有一个特征脸时画在一条直线上）
+        train_points, test_points = self._plane_points(train_features), self._plane_points(test_features)
+        colors = plt.cm.tab10(np.linspace(0, 1, len(np.unique(train_labels))))
+        
+        # 训练点
+        for label in np.unique(train_labels):
+            mask = train_labels == label
+            axes[0].scatter(train_points[mask, 0], train_points[mask, 1], 
+                          alpha=0.6, label=f'人物 {label+1}', color=colors[label])
+        
+        # 测试点
+        for point, true_label, pred_label, nearest_idx in zip(test_points, test_labels, predictions,
+                                                              nearest_indices):
+            color = 'green' if true_label == pred_label else 'red'
+            axes[0].scatter(point[0], point[1], color=color, s=100, 
+                          marker='*', edgecolor='black')
+            
+            # 添加连线到最近邻（复用识别阶段的搜索结果）
+            nearest_point = train_points[nearest_idx]
+            
+            axes[0].plot([point[0], nearest_point[0]], 
+                        [point[1], nearest_point[1]], 
+                        'gray', linestyle='--', alpha=0.5)
+        
+        axes[0].set_xlabel('特征脸1')
+        axes[0].set_ylabel('特征脸2')
+        axes[0].set_title('特征脸空间中的点')
+        axes[0].grid(True, alpha=0.3)
+        
+        # 限制图例数量
+        if len(np.unique(train_labels)) <= 10:
+            axes[0].legend()
+        
+        # 2. 距离分布
+        same_class_dists, diff_class_dists = self._pair_distances(train_features, train_labels)
+        
+        axes[1].hist(same_class_dists, bins=20, alpha=0.7, label='同一人', color='blue')
+        axes[1].hist(diff_class_dists, bins=20, alpha=0.7, label='不同人', color='red')
+        axes[1].set_xlabel('欧氏距离')
+        axes[1].set_ylabel('频数')
+        axes[1].set_title('距离分布')
+        axes[1].legend()
+        axes[1].grid(True, alpha=0.3)
+        
+        # 3. 识别结果
+        axes[2].axis('off')
+        
+        # 计算准确率
+        accuracy = np.mean(predictions == test_labels) * 100
+        
+        result_text = f"""
+        人脸识别结果:
+        
+        测试样本数: {len(test_labels)}
+        正确识别: {np.sum(predictions == test_labels)}
+        识别错误: {np.sum(predictions != test_labels)}
+        
+        准确率: {accuracy:.2f}%
+        
+        混淆矩阵:
+        """
+        
+        axes[2].text(0.1, 0.7, result_text, ha='left', va='top', fontsize=12,
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="lightyellow"))
+        
+        # 显示示例
+        n_examples = min(3, len(test_features))
+        for i in range(n_examples):
+            status = "✅ 正确" if predictions[i] == test_labels[i] else "❌ 错误"
+            example_text = f"测试{i+1}: 人物{test_labels[i]+1} → 识别为人物{predictions[i]+1} {status}"
+            axes[2].text(0.1, 0.5 - i*0.1, example_text, ha='left', va='top', fontsize=10)
+        
+        plt.tight_layout()
+        return fig
+    
+    @staticmethod
+    def _plane_points(features):
+        """散点图使用的前两维坐标；只有一维时第二维取 0"""
+        points = np.zeros((len(features), 2), dtype=features.dtype)
+        points[:, :min(2, features.shape[1])] = features[:, :2]
+        return points
+    
+    @staticmethod
+    def _pair_distances(train_features, train_labels, n_pairs=100):
+        """随机抽取样本对，返回同一人和不同人之间的欧氏距离"""
+        same_class_dists = []
+        diff_class_dists = []
+        
+        rng = np.random.default_rng(42)
+        n_samples = min(n_pairs, len(train_features))
+        for _ in range(n_samples):
+            i, j = rng.choice(len(train_features), 2, replace=False)
+            dist = np.linalg.norm(train_features[i] - train_features[j])
+            
+            if train_labels[i] == train_labels[j]:
+                same_class_dists.append(dist)
+            else:
+                diff_class_dists.append(dist)
+        return same_class_dists, diff_class_dists
+    
+    def _viz_complete_system(self, stage_latency, metrics):
+        """可视化：完整系统（流程图标注实测耗时）"""
+        plt = _pyplot()
+        fig, ax = plt.subplots(figsize=(12, 8))
+        ax.axis('off')
+        
+        # 绘制系统流程图（最后一项为对应的计时阶段）
+        components = [
+            ("📷 图像输入", (0.1, 0.9), "lightblue", None),
+            ("🖼️ 预处理", (0.3, 0.9), "lightgreen", 'preprocess'),
+            ("📐 向量化", (0.5, 0.9), "lightyellow", 'vectorize'),
+            ("🎯 中心化", (0.7, 0.9), "lightcoral", 'center'),
+            ("🔧 PCA降维", (0.9, 0.9), "lightpink", 'fit'),
+            
+            ("🎭 特征提取", (0.9, 0.7), "lightseagreen", 'gallery'),
+            ("🚀 投影", (0.9, 0.5), "lightskyblue", 'project'),
+            ("📏 距离计算", (0.7, 0.5), "lightgoldenrodyellow", 'distance'),
+            ("🎯 分类识别", (0.5, 0.5), "lightcoral", 'classify'),
+            ("✅ 输出结果", (0.3, 0.5), "lightgreen", None)
+        ]
+        
+        # 绘制组件
+        for text, (x, y), color, stage in components:
+            ax.add_patch(plt.Rectangle((x-0.08, y-0.04), 0.16, 0.08, 
+                                     facecolor=color, edgecolor='black', 
+                                     linewidth=2, alpha=0.8))
+            ax.text(x, y, text, ha='center', va='center', fontsize=10)
+            
+            # 标注实测耗时
+            timing = stage_latency.get(stage)
+            if timing is None:
+                continue
+            if 'total_ms' in timing:
+                label = f"训练 {timing['total_ms']:.1f} ms"
+            else:
+                label = f"p50 {timing['p50_ms']*1000:.0f} µs / p95 {timing['p95_ms']*1000:.0f} µs"
+            ax.text(x, y - 0.06, label, ha='center', va='top', fontsize=8, color='dimgray')
+        
+        # 绘制连接线
+        connections = [
+            ((0.1, 0.9), (0.3, 0.9)),
+            ((0.3, 0.9), (0.5, 0.9)),
+            ((0.5, 0.9), (0.7, 0.9)),
+            ((0.7, 0.9), (0.9, 0.9)),
+            ((0.9, 0.9), (0.9, 0.7)),
+            ((0.9, 0.7), (0.9, 0.5)),
+            ((0.9, 0.5), (0.7, 0.5)),
+            ((0.7, 0.5), (0.5, 0.5)),
+            ((0.5, 0.5), (0.3, 0.5))
+        ]
+        
+        for (x1, y1), (x2, y2) in connections:
+            ax.arrow(x1, y1, x2-x1, y2-y1, head_width=0.02, head_length=0.02, 
+                    fc='gray', ec='gray', width=0.005)
+        
+        # 添加性能指标（均为实测值）
+        metrics_text = f"""
+        系统性能指标:
+        
+        • 识别准确率: {metrics['accuracy']:.1f}% ({metrics['n_test']}张测试人脸)
+        • 处理时间: p50 {metrics['per_face_p50_ms']:.3f} ms / p95 {metrics['per_face_p95_ms']:.3f} ms 每张人脸
+        • 批量吞吐量: {metrics['throughput']:,.0f} 张/秒
+        • 维度压缩: {metrics['n_features']} → {metrics['n_components']} ({metrics['n_components'] / metrics['n_features'] * 100:.2f}%)
+        • 特征脸数量: {metrics['n_components']}个
+        • 训练样本: {metrics['n_train']}张人脸
+        • 模型+人脸库内存: {metrics['memory_mb']:.2f} MB
+        """
+        
+        ax.text(0.5, 0.2, metrics_text, ha='center', va='center', fontsize=12,
+                bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.9))
+        
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+        ax.set_title('完整人脸识别系统流程图', fontsize=16, fontweight='bold')
+        
+        return fig
+    
+    # ============================================================================
+    # 浏览器端图表（Vega-Lite 规格，参数与对应的 _viz_* 方法相同）
+    # ============================================================================
+    def _chart_centering(self, original_data, centered_data, mean_vector):
+        """图表：数据中心化"""
+        original = _chart_records({'x': original_data[:, 0], 'y': original_data[:, 1]}, 类型='原始')
+        centered = _chart_records({'x': centered_data[:, 0], 'y': centered_data[:, 1]}, 类型='中心化后')
+        n_arrows = min(10, len(original_data))
+        arrows = _chart_records({'x': original_data[:n_arrows, 0], 'y': original_data[:n_arrows, 1],
+                                 'x2': centered_data[:n_arrows, 0], 'y2': centered_data[:n_arrows, 1]})
+        return [
+            _chart('原始数据 (有偏移)', [
+                _point_layer(original),
+                _point_layer(_chart_records({'x': mean_vector[:1], 'y': mean_vector[1:2]}, 类型='均值'),
+                             size=300, shape='diamond')
+            ], '特征1', '特征2'),
+            _chart('减去均值的过程', [
+                _point_layer(original + centered),
+                {'data': {'values': arrows},
+                 'mark': {'type': 'rule', 'color': 'gray', 'opacity': 0.5},
+                 'encoding': {'x': {'field': 'x', 'type': 'quantitative'},
+                              'y': {'field': 'y', 'type': 'quantitative'},
+                              'x2': {'field': 'x2'}, 'y2': {'field': 'y2'}}}
+            ], '特征1', '特征2'),
+            _chart('中心化数据 (均值为0)', [
+                _point_layer(centered),
+                _point_layer([{'x': 0, 'y': 0, '类型': '新原点'}], size=300, shape='diamond')
+            ], '特征1', '特征2')
+        ]
+    
+    def _chart_covariance(self, data, cov_matrix):
+        """图表：协方差矩阵"""
+        mean_x, mean_y = np.mean(data, axis=0)
+        names = ['特征X', '特征Y']
+        cells = [{'行': names[i], '列': names[j], '协方差': round(float(cov_matrix[i, j]), 4)}
+                 for i in range(2) for j in range(2)]
+        cell_encoding = {'x': {'field': '列', 'type': 'nominal', 'sort': names, 'title': None},
+                         'y': {'field': '行', 'type': 'nominal', 'sort': names, 'title': None}}
+        return [
+            _chart('二维数据分布', [
+                _point_layer(_chart_records({'x': data[:, 0], 'y': data[:, 1]}, 类型='样本')),
+                {'data': {'values': [{'x': round(float(mean_x), 4)}]},
+                 'mark': {'type': 'rule', 'color': 'red', 'strokeDash': [4, 4]},
+                 'encoding': {'x': {'field': 'x', 'type': 'quantitative'}}},
+                {'data': {'values': [{'y': round(float(mean_y), 4)}]},
+                 'mark': {'type': 'rule', 'color': 'red', 'strokeDash': [4, 4]},
+                 'encoding': {'y': {'field': 'y', 'type': 'quantitative'}}}
+            ], '特征 X', '特征 Y'),
+            {
+                '$schema': VEGA_LITE_SCHEMA,
+                'title': '协方差矩阵',
+                'data': {'values': cells},
+                'encoding': cell_encoding,
+                'layer': [
+                    {'mark': {'type': 'rect', 'tooltip': True},
+                     'encoding': {'color': {'field': '协方差', 'type': 'quantitative',
+                                            'scale': {'scheme': 'redblue', 'reverse': True}}}},
+                    {'mark': {'type': 'text', 'fontSize': 16},
+                     'encoding': {'text': {'field': '协方差', 'type': 'quantitative', 'format': '.2f'}}}
+                ]
+            }
+        ]
+    
+    def _chart_reconstruction(self, original_face, reconstructed_faces, reconstruction_errors, components_list,
+                              shape, error_curve, dataset_error_curve):
+        """图表：重建误差 vs 特征脸数量"""
+        ks = np.arange(1, len(error_curve))
+        curves = _chart_records({'x': ks, 'y': error_curve[1:]}, 曲线='当前人脸') + \
+                 _chart_records({'x': ks, 'y': dataset_error_curve[1:]}, 曲线='数据集平均')
+        line = {
+            'data': {'values': curves},
+            'mark': {'type': 'line', 'tooltip': True},
+            'encoding': {'x': {'field': 'x', 'type': 'quantitative', 'scale': {'type': 'log'}},
+                         'y': {'field': 'y', 'type': 'quantitative'},
+                         'color': {'field': '曲线', 'type': 'nominal',
+                                   'scale': {'domain': ['当前人脸', '数据集平均'], 'range': ['red', 'blue']}},
+                         'strokeDash': {'field': '曲线', 'type': 'nominal', 'legend': None}}
+        }
+        values = _chart_records({'x': components_list, 'y': reconstruction_errors})
+        points = {
+            'data': {'values': values},
+            'mark': {'type': 'point', 'filled': True, 'size': 80, 'color': 'red', 'tooltip': True},
+            'encoding': {'x': {'field': 'x', 'type': 'quantitative', 'scale': {'type': 'log'}},
+                         'y': {'field': 'y', 'type': 'quantitative'}}
+        }
+        labels = {
+            'data': {'values': values},
+            'mark': {'type': 'text', 'dy': -12},
+            'encoding': {'x': {'field': 'x', 'type': 'quantitative', 'scale': {'type': 'log'}},
+                         'y': {'field': 'y', 'type': 'quantitative'},
+                         'text': {'field': 'y', 'type': 'quantitative', 'format': '.4f'}}
+        }
+        return [_chart('重建误差 vs 特征脸数量', [line, points, labels], '特征脸数量', '重建误差 (MSE)')]
+    
+    def _chart_face_recognition(self, train_features, test_features, train_labels, test_labels, predictions,
+                                nearest_indices):
+        """图表：人脸识别"""
+        train_points, test_points = self._plane_points(train_features), self._plane_points(test_features)
+        train = _chart_records({'x': train_points[:, 0], 'y': train_points[:, 1],
+                                '人物': np.asarray(train_labels) + 1})
+        correct = np.asarray(predictions) == np.asarray(test_labels)
+        test = _chart_records({'x': test_points[:, 0], 'y': test_points[:, 1],
+                               '真实': np.asarray(test_labels) + 1, '识别为': np.asarray(predictions) + 1,
+                               '结果': np.where(correct, '正确', '错误')})
+        nearest = train_points[nearest_indices]
+        links = _chart_records({'x': test_points[:, 0], 'y': test_points[:, 1],
+                                'x2': nearest[:, 0], 'y2': nearest[:, 1]})
+        
+        train_layer = _point_layer(train, color='人物', size=40)
+        if len(np.unique(train_labels)) > 10:
+            train_layer['encoding']['color']['legend'] = None
+        test_layer = _point_layer(test, color='结果', size=160, shape='diamond')
+        test_layer['encoding']['color']['scale'] = {'domain': ['正确', '错误'], 'range': ['green', 'red']}
+        link_layer = {
+            'data': {'values': links},
+            'mark': {'type': 'rule', 'color': 'gray', 'strokeDash': [4, 4], 'opacity': 0.5},
+            'encoding': {'x': {'field': 'x', 'type': 'quantitative'},
+                         'y': {'field': 'y', 'type': 'quantitative'},
+                         'x2': {'field': 'x2'}, 'y2': {'field': 'y2'}}
+        }
+        
+        same_class_dists, diff_class_dists = self._pair_distances(train_features, train_labels)
+        distances = (_chart_records({'距离': same_class_dists}, 类型='同一人') if same_class_dists else []) + \
+                    (_chart_records({'距离': diff_class_dists}, 类型='不同人') if diff_class_dists else [])
+        accuracy = np.mean(correct) * 100
+        
+        return [
+            _chart('特征脸空间中的点', [train_layer, link_layer, test_layer], '特征脸1', '特征脸2',
+                   resolve={'scale': {'color': 'independent'}}),
+            {
+                '$schema': VEGA_LITE_SCHEMA,
+                'title': '距离分布',
+                'data': {'values': distances},
+                'mark': {'type': 'bar', 'opacity': 0.7, 'tooltip': True},
+                'encoding': {
+                    'x': {'field': '距离', 'type': 'quantitative', 'bin': {'maxbins': 20}, 'title': '欧氏距离'},
+                    'y': {'aggregate': 'count', 'type': 'quantitative', 'stack': None, 'title': '频数'},
+                    'color': {'field': '类型', 'type': 'nominal',
+                              'scale': {'domain': ['同一人', '不同人'], 'range': ['blue', 'red']}}
+                }
+            },
+            {
+                '$schema': VEGA_LITE_SCHEMA,
+                'title': f'识别结果：准确率 {accuracy:.2f}%',
+                'data': {'values': [{'结果': '正确', '数量': int(correct.sum())},
+                                    {'结果': '错误', '数量': int((~correct).sum())}]},
+                'mark': {'type': 'bar', 'tooltip': True},
+                'encoding': {
+                    'x': {'field': '结果', 'type': 'nominal', 'sort': ['正确', '错误'], 'title': None},
+                    'y': {'field': '数量', 'type': 'quantitative', 'title': '测试样本数'},
+                    'color': {'field': '结果', 'type': 'nominal', 'legend': None,
+                              'scale': {'domain': ['正确', '错误'], 'range': ['green', 'red']}}
+                }
+            }
+        ]
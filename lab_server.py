@@ -0,0 +1,325 @@
+"""
+虚拟实验室本地 HTTP 服务
+让 planets 下的网页和根目录页面直接调用 Python 端的特征脸计算，
+不必在每个页面里各自实现一遍 PCA。
+
+用法：
+    python lab_server.py --port 8502 --shape 112x92
+    python lab_server.py --dataset /path/to/orl
+
+接口（默认返回 JSON；加 ?format=binary 或 Accept: application/octet-stream 时返回二进制）：
+    GET  /api/info                                  数据集和模型信息
+    POST /api/experiment   {"experiment_id": 6, "params": {...}, "images": false, "charts": false}
+    POST /api/project      {"faces": [[...]], "n_components": 20}
+    POST /api/reconstruct  {"coords": [[...]], "n_components": 20}
+    POST /api/recognize    {"faces": [[...]], "n_components": 20, "k": 1}
+    POST /api/batch        {"requests": [{"op": "project", ...}, ...]}
+
+project/recognize 也接受 application/octet-stream 请求体：原始 little-endian float32
+人脸矩阵（N×D，D 为数据集维度），其余参数放在查询字符串中。
+
+二进制响应格式：
+    [uint32 头部长度 L][L 字节 UTF-8 JSON 头部][填充到 4 字节对齐][数据区]
+    头部中的数组以 {"$array": i} 占位，arrays[i] 给出 dtype、shape 和在数据区中的 offset，
+    offset 按 4 字节对齐，浏览器端可直接构造 Float32Array / Int32Array（见 utils/lab-api.js）。
+
+使用 HTTP/1.1 并始终返回 Content-Length，浏览器会复用连接（keep-alive）。
+"""
+
+import argparse
+import base64
+import json
+import struct
+import sys
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from lab_core import LRUCache, VirtualFaceLab, check_experiment_params, knn_search
+
+# ============================================================================
+# 序列化
+# ============================================================================
+BINARY_MIME = 'application/octet-stream'
+OPERATIONS = ('info', 'experiment', 'project', 'reconstruct', 'recognize', 'batch')
+
+
+class NotFoundError(LookupError):
+    """请求的资源（如实验编号）不存在，对应 HTTP 404"""
+
+
+def to_payload(obj, arrays=None):
+    """把实验结果转换为可 JSON 序列化的结构
+
+    arrays 为 None 时数组转成列表、图片转成 base64；
+    否则数组（浮点转 float32，整数转 int32）追加到 arrays 中，原位置用 {"$array": i} 占位。
+    """
+    if isinstance(obj, dict):
+        return {key: to_payload(value, arrays) for key, value in obj.items() if key != 'viz_spec'}
+    if isinstance(obj, (list, tuple)):
+        return [to_payload(value, arrays) for value in obj]
+    if isinstance(obj, bytes):
+        if arrays is None:
+            return base64.b64encode(obj).decode('ascii')
+        obj = np.frombuffer(obj, dtype=np.uint8)
+    if isinstance(obj, np.ndarray):
+        if arrays is None:
+            return obj.tolist()
+        if obj.dtype.kind == 'f':
+            obj = obj.astype('<f4', copy=False)
+        elif obj.dtype.kind in 'iub' and obj.dtype != np.uint8:
+            obj = obj.astype('<i4', copy=False)
+        arrays.append(np.ascontiguousarray(obj))
+        return {'$array': len(arrays) - 1}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def encode_binary(obj):
+    """按模块说明中的二进制格式编码"""
+    arrays = []
+    header = to_payload(obj, arrays)
+    specs, offset = [], 0
+    for array in arrays:
+        specs.append({'dtype': array.dtype.name, 'shape': list(array.shape),
+                      'offset': offset, 'nbytes': array.nbytes})
+        offset += (array.nbytes + 3) // 4 * 4
+    header_bytes = json.dumps({'data': header, 'arrays': specs}, ensure_ascii=False).encode('utf-8')
+    header_bytes += b' ' * (-(4 + len(header_bytes)) % 4)
+
+    chunks = [struct.pack('<I', len(header_bytes)), header_bytes]
+    for array in arrays:
+        raw = array.tobytes()
+        chunks.append(raw + b'\0' * (-len(raw) % 4))
+    return b''.join(chunks)
+
+
+# ============================================================================
+# 计算服务
+# ============================================================================
+class LabService:
+    """包装共享的 VirtualFaceLab，提供批量投影、重建和识别"""
+
+    def __init__(self, lab):
+        self.lab = lab
+        # 人脸库特征按 (数据集版本, 特征脸数量) 缓存
+        self._galleries = LRUCache(maxsize=16)
+
+    def info(self):
+        faces = self.lab.simulation_data['faces']
+        model = self.lab.get_eigen_model()
+        return {
+            'shape': list(faces['shape']),
+            'dim': int(faces['data'].shape[1]),
+            'count': int(faces['count']),
+            'people': int(faces['people']),
+            'n_components': model.n_components,
+            'decomposition': model.method,
+            'dtype': self.lab.dtype.name,
+            'dataset_version': self.lab.dataset_version,
+            'cache': self.lab.cache_info()
+        }
+
+    def experiment(self, experiment_id, params=None, images=False, charts=False):
+        """images 返回服务端绘制的图片，charts 返回可用 vega-embed 渲染的 Vega-Lite 规格"""
+        experiment_id = int(experiment_id)
+        # 客户端参数先检查范围，超出范围返回 400 而不是在计算中途出错
+        check_experiment_params(experiment_id, params)
+        if images or charts:
+            result = self.lab.run_experiment(experiment_id, params, charts=charts)
+        else:
+            result = self.lab.compute_experiment(experiment_id, params)
+        # 未知实验编号时实验室返回 {'error': ...}
+        if 'error' in result:
+            raise NotFoundError(f"实验{experiment_id}: {result['error']}")
+        if not images:
+            result.pop('visualization', None)
+        if 'charts' in result:
+            result['charts'] = [json.loads(spec) for spec in result['charts']]
+        return result
+
+    def _faces(self, faces):
+        faces = np.atleast_2d(np.asarray(faces, dtype=self.lab.dtype))
+        dim = self.lab.simulation_data['faces']['data'].shape[1]
+        if faces.shape[1] != dim:
+            raise ValueError(f"人脸维度应为 {dim}，收到 {faces.shape[1]}")
+        return faces
+
+    def project(self, faces, n_components=None):
+        coords = self.lab.get_eigen_model().project(self._faces(faces), n_components)
+        return {'coords': coords}
+
+    def reconstruct(self, coords, n_components=None):
+        coords = np.atleast_2d(np.asarray(coords, dtype=self.lab.dtype))
+        return {'faces': self.lab.get_eigen_model().reconstruct(coords, n_components)}
+
+    def _gallery(self, n_components):
+        key = (self.lab.dataset_version, n_components)
+        gallery = self._galleries.get(key)
+        if gallery is None:
+            faces = self.lab.simulation_data['faces']
+            features = self.lab.pipeline.get('projection')[:, :n_components]
+            gallery = (features, np.einsum('ij,ij->i', features, features), faces['labels'])
+            self._galleries.put(key, gallery)
+        return gallery
+
+    def recognize(self, faces, n_components=20, k=1):
+        model = self.lab.get_eigen_model()
+        n_components = min(int(n_components), model.n_components)
+        features, sq_norms, labels = self._gallery(n_components)
+        coords = model.project(self._faces(faces), n_components)
+        indices, distances = knn_search(coords, features, int(k), gallery_sq_norms=sq_norms)
+        return {'labels': labels[indices], 'indices': indices, 'distances': distances}
+
+    def dispatch(self, op, body):
+        if op == 'info':
+            return self.info()
+        if op == 'experiment':
+            return self.experiment(body['experiment_id'], body.get('params'), body.get('images', False),
+                                   body.get('charts', False))
+        if op == 'project':
+            return self.project(body['faces'], body.get('n_components'))
+        if op == 'reconstruct':
+            return self.reconstruct(body['coords'], body.get('n_components'))
+        if op == 'recognize':
+            return self.recognize(body['faces'], body.get('n_components', 20), body.get('k', 1))
+        if op == 'batch':
+            # 批处理：一次请求执行多个操作，单个失败不影响其他操作
+            responses = []
+            for request in body['requests']:
+                try:
+                    responses.append(self.dispatch(request['op'], request))
+                except (NotFoundError, KeyError, TypeError, ValueError) as error:
+                    responses.append({'error': str(error)})
+            return {'responses': responses}
+        raise KeyError(f"未知接口: {op}")
+
+
+# ============================================================================
+# HTTP 处理
+# ============================================================================
+class LabRequestHandler(BaseHTTPRequestHandler):
+    """/api/<op> 路由到 LabService.dispatch"""
+
+    protocol_version = 'HTTP/1.1'
+    service = None
+
+    def do_OPTIONS(self):
+        self._send(204, b'', 'text/plain')
+
+    def do_GET(self):
+        self._handle({})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length) if length else b''
+        try:
+            query = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+            if self.headers.get('Content-Type', '').startswith(BINARY_MIME):
+                body = self._binary_body(raw, query)
+            else:
+                body = json.loads(raw or b'{}')
+        except (ValueError, KeyError) as error:
+            self._send_json(400, {'error': f"请求体无效: {error}"})
+            return
+        self._handle(body)
+
+    def _binary_body(self, raw, query):
+        """二进制请求体：float32 人脸矩阵，参数来自查询字符串"""
+        dim = self.service.lab.simulation_data['faces']['data'].shape[1]
+        faces = np.frombuffer(raw, dtype='<f4')
+        if faces.size % dim:
+            raise ValueError(f"数据长度不是人脸维度 {dim} 的整数倍")
+        body = {'faces': faces.reshape(-1, dim)}
+        for name in ('n_components', 'k'):
+            if name in query:
+                body[name] = int(query[name])
+        return body
+
+    def _handle(self, body):
+        url = urlparse(self.path)
+        if not url.path.startswith('/api/'):
+            self._send_json(404, {'error': '未找到'})
+            return
+        op = url.path[len('/api/'):].strip('/')
+        if op not in OPERATIONS:
+            self._send_json(404, {'error': f"未知接口: {op}"})
+            return
+        try:
+            result = self.service.dispatch(op, body)
+        except NotFoundError as error:
+            self._send_json(404, {'error': str(error)})
+            return
+        except KeyError as error:
+            self._send_json(400, {'error': f"缺少字段: {error}"})
+            return
+        except (TypeError, ValueError) as error:
+            self._send_json(400, {'error': str(error)})
+            return
+        except Exception as error:
+            # 其他异常是服务端错误：记录堆栈，返回 JSON 错误而不是断开连接
+            traceback.print_exc(file=sys.stderr)
+            self._send_json(500, {'error': f"服务器内部错误: {type(error).__name__}: {error}"})
+            return
+
+        wants_binary = ('format=binary' in url.query or
+                        BINARY_MIME in self.headers.get('Accept', ''))
+        if wants_binary:
+            self._send(200, encode_binary(result), BINARY_MIME)
+        else:
+            self._send_json(200, result)
+
+    def _send_json(self, status, obj):
+        self._send(status, json.dumps(to_payload(obj), ensure_ascii=False).encode('utf-8'),
+                   'application/json; charset=utf-8')
+
+    def _send(self, status, payload, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        # 允许本地静态页面（file:// 或其他端口）跨域访问
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Accept')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(lab, host='127.0.0.1', port=8502):
+    """创建（未启动的）HTTP 服务，lab 需已完成 setup_lab"""
+    handler = type('BoundLabRequestHandler', (LabRequestHandler,), {'service': LabService(lab)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='虚拟实验室本地 HTTP 服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--shape', default='10x8', help='虚拟人脸分辨率，高x宽')
+    parser.add_argument('--dataset', default=None, help='人脸图像目录或已导入的存储目录')
+    args = parser.parse_args(argv)
+
+    height, width = (int(x) for x in args.shape.lower().split('x'))
+    lab = VirtualFaceLab()
+    lab.setup_lab(args.dataset, shape=(height, width))
+    lab.get_eigen_model()
+
+    server = create_server(lab, args.host, args.port)
+    print(f"🔬 虚拟实验室 API 已启动: http://{args.host}:{args.port}/api/info")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+虚拟实验室预计算
+在上课前把每个实验、每个滑块取值的计算结果和图像预先算好，写入磁盘缓存。
+应用启动时内存映射该缓存（见 virtual_lab.py 的 load_shared_lab），
+第一位拖动滑块的学生也不需要等待计算和绘图。
+
+用法：
+    python precompute_lab.py                          # 所有分辨率，写入 lab_cache/
+    python precompute_lab.py --resolutions 112x92 --workers 4
+    python precompute_lab.py --dataset /path/to/orl   # 真实数据集（分辨率由数据集决定）
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from lab_core import (FIGURE_FORMAT, PRECOMPUTED_EXPERIMENTS, RESOLUTIONS, FigureRenderPool, VirtualFaceLab,
+                      iter_param_grid)
+
+
+def parse_pair(text):
+    """把 '112x92' 解析为 (112, 92)"""
+    first, second = text.lower().split('x')
+    return int(first), int(second)
+
+
+def precompute_resolution(shape, args, render_pool):
+    """为一种分辨率（或真实数据集）生成缓存目录，返回 (目录, 组合数, 字节数, 秒数)"""
+    lab = VirtualFaceLab(render_pool=render_pool)
+    lab.setup_lab(args.dataset, shape=shape)
+    lab.get_eigen_model()
+    height, width = lab.simulation_data['faces']['shape']
+    store_dir = os.path.join(args.output, f'{height}x{width}')
+
+    def progress(fraction, message):
+        print(f"\r  [{fraction:6.1%}] {message:<60}", end='', flush=True)
+
+    print(f"📦 {height}×{width} → {store_dir}")
+    start = time.perf_counter()
+    count = lab.precompute(store_dir, args.experiments, fmt=args.format, workers=args.workers,
+                           progress=progress)
+    elapsed = time.perf_counter() - start
+    nbytes = sum(os.path.getsize(os.path.join(store_dir, name)) for name in ('data.bin', 'index.json'))
+    print()
+    return store_dir, count, nbytes, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='虚拟实验室预计算')
+    parser.add_argument('--output', default='lab_cache', help='缓存根目录（每种分辨率一个子目录）')
+    parser.add_argument('--resolutions', default=','.join(f'{h}x{w}' for h, w in RESOLUTIONS),
+                        help='分辨率列表，高x宽，逗号分隔')
+    parser.add_argument('--dataset', default=None, help='人脸图像目录（与应用的 FACE_LAB_DATASET 相同）')
+    parser.add_argument('--experiments', default=','.join(map(str, PRECOMPUTED_EXPERIMENTS)),
+                        help='实验编号列表，逗号分隔（实验10现场计时，不预计算）')
+    parser.add_argument('--format', default=FIGURE_FORMAT, help='图像编码格式（与应用一致）')
+    parser.add_argument('--workers', type=int, default=1, help='并行绘图的进程数')
+    args = parser.parse_args(argv)
+    args.experiments = [int(x) for x in args.experiments.split(',') if int(x) in PRECOMPUTED_EXPERIMENTS]
+
+    print(f"共 {len(list(iter_param_grid(args.experiments)))} 个 (实验, 参数) 组合")
+    render_pool = None
+    if args.workers > 1:
+        # 提交线程数与进程数相同，队列不会溢出；离线任务，单张图不设超时
+        render_pool = FigureRenderPool(max_workers=args.workers, max_pending=2 * args.workers, timeout=None)
+
+    shapes = [None] if args.dataset else [parse_pair(text) for text in args.resolutions.split(',')]
+    try:
+        for shape in shapes:
+            store_dir, count, nbytes, elapsed = precompute_resolution(shape or (10, 8), args, render_pool)
+            print(f"  ✅ {count} 个组合，{nbytes / 1e6:.1f} MB，用时 {elapsed:.1f} 秒")
+    finally:
+        if render_pool is not None:
+            render_pool.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
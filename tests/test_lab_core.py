@@ -0,0 +1,238 @@
+"""lab_core 的回归测试"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from lab_core import (CenteredFaces, EigenfaceModel, IVFIndex, LabPipeline, LRUCache, PrecomputedStore,
+                      VirtualFaceLab, _solver_accuracy, available_solvers, check_experiment_params,
+                      generate_synthetic_faces, knn_search, second_moment_matrix)
+
+
+@pytest.fixture(scope='module')
+def lab():
+    lab = VirtualFaceLab()
+    lab.setup_lab()
+    return lab
+
+
+# 协方差分支（D <= N）和 Gram 分支（D > N）各一组数据
+FACE_SETS = {
+    'covariance': dict(n_people=40, n_variants=10, shape=(10, 8)),
+    'gram': dict(n_people=20, n_variants=10, shape=(20, 20)),
+}
+
+
+@pytest.fixture(scope='module', params=sorted(FACE_SETS))
+def faces(request):
+    return generate_synthetic_faces(**FACE_SETS[request.param])[0]
+
+
+# ============================================================================
+# 特征脸计算
+# ============================================================================
+@pytest.mark.parametrize('solver', [solver for solver in available_solvers() if solver != 'eigh'])
+def test_truncated_solvers_agree_with_eigh(faces, solver):
+    reference = EigenfaceModel(np.float64).fit(faces, solver='eigh')
+    model = EigenfaceModel().fit(faces, n_components=10, solver=solver)
+    accuracy = _solver_accuracy(model, reference, 10)
+    assert model.solver == solver and model.n_components == 10
+    assert accuracy['eigenvalue_error'] < 1e-5
+    assert accuracy['variance_ratio'] == pytest.approx(1.0, abs=1e-5)
+    assert accuracy['subspace_angle'] < 0.5
+
+
+@pytest.mark.parametrize('dtype, tolerance', [(np.float64, 1e-10), (np.float32, 1e-5)])
+def test_partial_fit_matches_full_fit(faces, dtype, tolerance):
+    """分批增量更新后与全量拟合的均值、特征值和主子空间一致"""
+    model = EigenfaceModel(dtype).fit(faces[:len(faces) // 2])
+    for start in range(len(faces) // 2, len(faces), 25):
+        model.partial_fit(faces[start:start + 25])
+    drift = model.drift_from(EigenfaceModel(np.float64).fit(faces), n_components=10)
+    assert model.n_samples == len(faces)
+    assert drift['mean_shift'] < tolerance
+    assert drift['eigenvalue_error'] < tolerance
+    assert drift['subspace_angle'] < 0.1
+
+
+class _CountingRows:
+    """记录读取了多少行的数据包装"""
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape
+        self.rows_read = 0
+
+    def __getitem__(self, rows):
+        chunk = self.data[rows]
+        self.rows_read += len(chunk)
+        return chunk
+
+
+@pytest.mark.parametrize('chunk_size', [7, 16, 64])
+def test_gram_matrix_reads_upper_triangle_only(chunk_size):
+    data = np.random.default_rng(0).random((50, 300))
+    rows = _CountingRows(data)
+    matrix, method = second_moment_matrix(CenteredFaces(rows, data.mean(axis=0), chunk_size))
+    centered = data - data.mean(axis=0)
+    assert method == 'gram'
+    np.testing.assert_allclose(matrix, centered @ centered.T / 49)
+    n_chunks = -(-len(data) // chunk_size)
+    # 每个块 i 读取一次，再读取 i 之后的块各一次
+    assert rows.rows_read <= len(data) * (n_chunks + 1) / 2 + chunk_size * n_chunks
+
+
+# ============================================================================
+# 检索
+# ============================================================================
+def _exact_neighbors(queries, gallery, k):
+    distances = np.linalg.norm(queries[:, None, :].astype(np.float64) - gallery[None, :, :], axis=2)
+    order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return order, np.take_along_axis(distances, order, axis=1)
+
+
+def test_knn_search_float32_reranks_to_float64_result():
+    """远离原点的 float32 数据展开式有明显的抵消误差，重排序后结果与 float64 直接计算一致"""
+    rng = np.random.default_rng(0)
+    gallery = (50 + rng.random((500, 16))).astype(np.float32)
+    queries = (50 + rng.random((50, 16))).astype(np.float32)
+    indices, distances = knn_search(queries, gallery, k=5)
+    expected_indices, expected_distances = _exact_neighbors(queries, gallery, 5)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-12)
+
+
+def test_ivf_all_lists_matches_brute_force():
+    rng = np.random.default_rng(1)
+    gallery = rng.normal(size=(2000, 8))
+    queries = rng.normal(size=(100, 8))
+    index = IVFIndex(gallery, n_lists=16)
+    expected = knn_search(queries, gallery, k=10)
+    for result in (index.search(queries, k=10, n_probe=16), index.search(queries, k=10, exact=True)):
+        np.testing.assert_array_equal(result[0], expected[0])
+        np.testing.assert_allclose(result[1], expected[1])
+
+
+def test_ivf_probes_until_k_candidates():
+    """探查的簇成员不足 k 个时继续探查，不返回空位"""
+    gallery = np.random.default_rng(2).normal(size=(300, 4))
+    indices, distances = IVFIndex(gallery, n_lists=30).search(gallery[:20], k=50, n_probe=1)
+    assert (indices >= 0).all() and np.isfinite(distances).all()
+    assert all(len(set(row)) == 50 for row in indices)
+
+
+# ============================================================================
+# 缓存
+# ============================================================================
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.info() == {'hits': 3, 'misses': 1, 'size': 2, 'maxsize': 2, 'nbytes': 0}
+
+
+def test_lru_cache_evicts_by_bytes():
+    cache = LRUCache(maxsize=10, max_bytes=100, sizeof=len)
+    cache.put('a', b'x' * 60)
+    cache.put('b', b'x' * 30)
+    cache.put('a', b'x' * 40)
+    cache.put('c', b'x' * 50)
+    assert cache.get('b') is None
+    assert cache.info()['size'] == 2 and cache.info()['nbytes'] == 90
+
+
+def test_precomputed_store_round_trip(lab, tmp_path):
+    grid = {2: {'n_samples': [2, 3]}, 9: {'index': ['brute']}}
+    assert lab.precompute(str(tmp_path), experiments=[2, 9], grid=grid) == 3
+    store = PrecomputedStore(str(tmp_path))
+    assert len(store) == 3
+    for experiment_id, params in [(2, {'n_samples': 3}), (9, {})]:
+        params = lab._normalize_params(experiment_id, params)
+        expected = lab.compute_experiment(experiment_id, params)
+        stored = store.result(experiment_id, params)
+        assert stored.keys() == expected.keys()
+        for name, value in expected.items():
+            if isinstance(value, np.ndarray):
+                np.testing.assert_array_equal(stored[name], value)
+            elif name != 'viz_spec':
+                assert stored[name] == value
+    assert store.result(2, {'n_samples': 20}) is None
+
+    fresh = VirtualFaceLab()
+    fresh.setup_lab()
+    assert fresh.load_precomputed(str(tmp_path))
+    assert fresh.compute_experiment(9, {})['accuracy'] == lab.compute_experiment(9, {})['accuracy']
+
+
+# ============================================================================
+# 计算流水线
+# ============================================================================
+def test_pipeline_miss_does_not_block_other_nodes():
+    """一个节点计算期间其他会话仍能读取缓存；同一个键并发请求只计算一次"""
+    pipeline = LabPipeline(np.random.default_rng(0).random((20, 6)))
+    mean = pipeline.get('mean')
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    compute_eigen = pipeline._compute_eigen
+
+    def slow_eigen(params, progress=None):
+        calls.append(params)
+        started.set()
+        release.wait(5)
+        return compute_eigen(params, progress)
+
+    pipeline._compute_eigen = slow_eigen
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(pipeline.get('eigen'))) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    assert started.wait(5)
+    reads = []
+    reader = threading.Thread(target=lambda: reads.append(pipeline.get('mean')))
+    reader.start()
+    reader.join(2)
+    blocked = reader.is_alive()
+    release.set()
+    reader.join(5)
+    assert not blocked and reads == [mean]
+    for worker in workers:
+        worker.join(5)
+    assert len(calls) == 1
+    assert len(results) == 3 and all(result is results[0] for result in results)
+
+
+# ============================================================================
+# 实验
+# ============================================================================
+@pytest.mark.parametrize('charts', [False, True])
+def test_face_recognition_single_component(lab, charts):
+    """只用一个特征脸时识别结果和图表都能生成（特征坐标只有一维）"""
+    result = lab.run_experiment(9, {'n_components': 1}, charts=charts)
+    assert result['n_components'] == 1
+    assert 'render_error' not in result
+    assert result.get('charts') or result.get('visualization')
+
+
+@pytest.mark.parametrize('experiment_id, params', [
+    (9, {'n_components': 0}),
+    (6, {'n_eigenfaces': 0}),
+    (2, {'n_samples': '5'}),
+    (7, {'n_components': True}),
+    (9, {'solver': 'svd'}),
+    (9, {'index': 'hnsw'}),
+    (8, []),
+])
+def test_check_experiment_params_rejects_out_of_range(experiment_id, params):
+    with pytest.raises(ValueError):
+        check_experiment_params(experiment_id, params)
+
+
+def test_check_experiment_params_accepts_defaults():
+    check_experiment_params(4, {'n_samples': None})
+    check_experiment_params(9, {'n_components': 1, 'index': 'ivf', 'solver': 'randomized'})
+    check_experiment_params(1, {})
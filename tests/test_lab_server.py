@@ -0,0 +1,119 @@
+"""lab_server 的回归测试"""
+
+import json
+import struct
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from lab_core import VirtualFaceLab
+from lab_server import BINARY_MIME, create_server, encode_binary
+
+DTYPES = {'float32': '<f4', 'int32': '<i4', 'uint8': 'u1'}
+
+
+def decode_binary(raw):
+    """与 utils/lab-api.js 的 FaceLabAPI.decode 相同的解析，额外检查数组按 4 字节对齐"""
+    header_length, = struct.unpack_from('<I', raw)
+    header = json.loads(raw[4:4 + header_length].decode('utf-8'))
+    data_start = 4 + header_length
+    arrays = []
+    for spec in header['arrays']:
+        assert (data_start + spec['offset']) % 4 == 0
+        dtype = np.dtype(DTYPES[spec['dtype']])
+        arrays.append(np.frombuffer(raw, dtype=dtype, count=spec['nbytes'] // dtype.itemsize,
+                                    offset=data_start + spec['offset']).reshape(spec['shape']))
+
+    def resolve(value):
+        if isinstance(value, list):
+            return [resolve(item) for item in value]
+        if isinstance(value, dict):
+            if '$array' in value:
+                return arrays[value['$array']]
+            return {key: resolve(item) for key, item in value.items()}
+        return value
+    return resolve(header['data'])
+
+
+def test_binary_frame_round_trip():
+    obj = {
+        'coords': np.arange(15, dtype=np.float64).reshape(5, 3) / 7,
+        'labels': np.array([3, 1, 2], dtype=np.int64),
+        'image': b'\x89PNG\x00',
+        'nested': [{'mask': np.array([True, False, True])}, 'text', 2.5],
+        'scalar': np.float32(1.5),
+    }
+    decoded = decode_binary(encode_binary(obj))
+    np.testing.assert_allclose(decoded['coords'], obj['coords'].astype(np.float32))
+    assert decoded['coords'].dtype == np.float32 and decoded['coords'].shape == (5, 3)
+    np.testing.assert_array_equal(decoded['labels'], [3, 1, 2])
+    assert decoded['image'].tobytes() == obj['image']
+    np.testing.assert_array_equal(decoded['nested'][0]['mask'], [1, 0, 1])
+    assert decoded['nested'][1:] == ['text', 2.5]
+    assert decoded['scalar'] == 1.5
+
+
+# ============================================================================
+# HTTP 接口
+# ============================================================================
+@pytest.fixture(scope='module')
+def server():
+    lab = VirtualFaceLab()
+    lab.setup_lab()
+    server = create_server(lab, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, op, body=None, data=None, headers=None):
+    """发送请求，返回 (状态码, Content-Type, 响应体字节)"""
+    url = f'http://127.0.0.1:{server.server_address[1]}/api/{op}'
+    if body is not None:
+        data = json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data, headers or {})) as response:
+            return response.status, response.headers['Content-Type'], response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers['Content-Type'], error.read()
+
+
+def test_binary_recognize(server):
+    faces = server.RequestHandlerClass.service.lab.simulation_data['faces']
+    queries = np.asarray(faces['data'][:4], dtype='<f4')
+    status, content_type, raw = request(server, 'recognize?k=2', data=queries.tobytes(),
+                                        headers={'Content-Type': BINARY_MIME, 'Accept': BINARY_MIME})
+    assert status == 200 and content_type == BINARY_MIME
+    result = decode_binary(raw)
+    assert result['indices'].shape == (4, 2)
+    np.testing.assert_array_equal(result['indices'][:, 0], np.arange(4))
+    np.testing.assert_array_equal(result['labels'][:, 0], faces['labels'][:4])
+
+
+@pytest.mark.parametrize('body, expected', [
+    ({'experiment_id': 99}, 404),
+    ({'experiment_id': 9, 'params': {'n_components': 0}}, 400),
+    ({'experiment_id': 6, 'params': {'n_eigenfaces': 0}}, 400),
+    ({}, 400),
+    ({'experiment_id': 2, 'params': {'n_samples': 3}}, 200),
+])
+def test_experiment_status_codes(server, body, expected):
+    status, content_type, raw = request(server, 'experiment', body)
+    assert status == expected
+    assert content_type.startswith('application/json')
+    assert ('error' in json.loads(raw)) == (expected != 200)
+
+
+def test_unexpected_error_returns_json_500(server, monkeypatch):
+    service = server.RequestHandlerClass.service
+    monkeypatch.setattr(service, 'info', lambda: 1 / 0)
+    monkeypatch.setattr('traceback.print_exc', lambda **kwargs: None)
+    status, content_type, raw = request(server, 'info')
+    assert status == 500 and content_type.startswith('application/json')
+    assert 'ZeroDivisionError' in json.loads(raw)['error']
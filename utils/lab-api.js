@@ -0,0 +1,100 @@
+/**
+ * 虚拟实验室 API 客户端
+ * 调用本地 lab_server.py 提供的特征脸计算，页面无需自带 PCA 实现
+ */
+
+class FaceLabAPI {
+    constructor(baseUrl = 'http://127.0.0.1:8502') {
+        this.baseUrl = baseUrl.replace(/\/$/, '');
+        this.info = null;
+    }
+
+    async connect() {
+        this.info = await this.request('info', null, { method: 'GET' });
+        console.log(`已连接虚拟实验室: ${this.info.shape.join('×')} 像素, ${this.info.count} 张人脸`);
+        return this.info;
+    }
+
+    async request(op, body, { method = 'POST', binary = true, query = '' } = {}) {
+        const headers = { 'Accept': binary ? 'application/octet-stream' : 'application/json' };
+        let payload;
+        if (body instanceof Float32Array) {
+            headers['Content-Type'] = 'application/octet-stream';
+            payload = body;
+        } else if (body) {
+            headers['Content-Type'] = 'application/json';
+            payload = JSON.stringify(body, (key, value) =>
+                ArrayBuffer.isView(value) ? Array.from(value) : value);
+        }
+
+        const response = await fetch(`${this.baseUrl}/api/${op}${query}`, { method, headers, body: payload });
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.error || `请求失败: ${response.status}`);
+        }
+        if ((response.headers.get('Content-Type') || '').startsWith('application/octet-stream')) {
+            return FaceLabAPI.decode(await response.arrayBuffer());
+        }
+        return response.json();
+    }
+
+    runExperiment(experimentId, params = {}, images = false) {
+        return this.request('experiment', { experiment_id: experimentId, params, images });
+    }
+
+    // faces: 按行展开的 Float32Array（N×D），以原始二进制发送
+    project(faces, nComponents) {
+        const query = nComponents ? `?n_components=${nComponents}` : '';
+        return this.request('project', FaceLabAPI.toFloat32(faces), { query });
+    }
+
+    // nComponents 省略时使用 coords 的全部坐标
+    reconstruct(coords, nComponents) {
+        return this.request('reconstruct', { coords, n_components: nComponents });
+    }
+
+    recognize(faces, nComponents = 20, k = 1) {
+        return this.request('recognize', FaceLabAPI.toFloat32(faces),
+            { query: `?n_components=${nComponents}&k=${k}` });
+    }
+
+    // requests: [{ op: 'project', faces: [...] }, { op: 'experiment', experiment_id: 6 }, ...]
+    batch(requests) {
+        return this.request('batch', { requests });
+    }
+
+    static toFloat32(faces) {
+        return faces instanceof Float32Array ? faces : Float32Array.from(faces.flat());
+    }
+
+    // 解析二进制响应：[uint32 头部长度][JSON 头部][数据区]，数组直接映射为类型化数组
+    static decode(buffer) {
+        const headerLength = new DataView(buffer).getUint32(0, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+        const dataStart = 4 + headerLength;
+        const types = { float32: Float32Array, int32: Int32Array, uint8: Uint8Array };
+
+        const arrays = header.arrays.map(spec => {
+            const TypedArray = types[spec.dtype];
+            const length = spec.nbytes / TypedArray.BYTES_PER_ELEMENT;
+            const data = new TypedArray(buffer, dataStart + spec.offset, length);
+            return { data, shape: spec.shape };
+        });
+
+        const resolve = value => {
+            if (Array.isArray(value)) {
+                return value.map(resolve);
+            }
+            if (value && typeof value === 'object') {
+                if ('$array' in value) {
+                    return arrays[value.$array];
+                }
+                return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, resolve(item)]));
+            }
+            return value;
+        };
+        return resolve(header.data);
+    }
+}
+
+window.FaceLabAPI = FaceLabAPI;